@@ -21,6 +21,22 @@ limitations under the License.
 #          Coast Forest Region Geomatic Services
 #
 # Required Arguments: input table (VRI having VEG_COMP(2009) field names)
+# Optional Arguments: --levels 125 175 225 (utilization levels, default 175)
+#                     --engine row|numpy (default row)
+#                     --chunk-size N or --memory-mb M (stream in chunks)
+#                     --workers N (compute OBJECTID ranges in N processes)
+#                     --incremental (only recompute rows whose inputs changed)
+#                     --pipeline (overlap reading, computing and writing)
+#                     --checkpoint FILE (resume an interrupted run)
+#                     --area-from-geometry (derive area from the geometry;
+#                     automatic when GEOMETRY_Area is missing)
+#                     --qa [--qa-sample N] (data quality checks)
+#                     --progress-every N, --report FILE, --profile FILE
+#                     --sidecar DIR [--sidecar-key FIELD] (write the
+#                     volumes to .npy column files, not the table)
+#                     --summary-by FIELD ... --summary-output OUT
+#                     (sum group volumes by key fields, e.g. TSA_NUMBER)
+#                     --summary-only (write the summary, not the volumes)
 #
 # Description: This tool adds fields to a VRI table for tabulating
 #              volume (m3) by species group in polygon
@@ -32,154 +48,37 @@ limitations under the License.
 #    2009.08.24 - corrected to run with 9.3-version Geoprocessor
 #    2014.09.06 - updated to run with arcpy ESRI ArcGIS 10.3, updated
 #                 to work with updated VRI schema
+#    2026.10.17 - table access through vri_backends so the tool also
+#                 runs on GeoPackage / SQLite tables without arcpy,
+#                 species group totals moved to vri_species
+#    2026.10.17 - added the numpy vectorized engine option
+#    2026.10.17 - fields added in one batch, zero defaults folded into
+#                 the compute pass
+#    2026.10.17 - added streaming in OBJECTID range chunks
+#    2026.10.17 - added multi-process execution by OBJECTID range
+#    2026.10.17 - added incremental recompute of changed rows
+#    2026.10.17 - added pipelined read / compute / write
+#    2026.10.17 - added stage timing, progress and run reports
+#    2026.10.17 - added group volume summary by key fields
+#    2026.10.17 - added sidecar column file output
+#    2026.10.17 - added multiple utilization levels in one pass
+#    2026.10.17 - added checkpoints to resume interrupted runs
+#    2026.10.17 - polygon area derived from the geometry when
+#                 GEOMETRY_Area is missing or stale
+#    2026.10.17 - added data quality checks in the volume pass
+#    2026.10.17 - only the declared input and output fields are read,
+#                 update through arcpy.da.UpdateCursor
 #
 # ------------------------------------------------------------------------
 """
 
-import arcpy
-import sys
+from vri_volumes import build_parser, run_tool, totals_job
 
-# Get required input table
-inputVRI = sys.argv[1]
-arcpy.AddMessage('The input data set is: ' + inputVRI)
+if __name__ == '__main__':
+    # Get required input table
+    parser = build_parser('Add fields for tabulating volume (m3) by species group to a VRI table',
+                          species=False)
+    args = parser.parse_args()
 
-# Add fields to input table
-arcpy.AddMessage('Adding volume tabulation fields to VRI table... ')
-lstNewFields = ["Alder", "Aspen", "Balsam", "Birch", "Cedar", "CtWood", "Cypress",
-                "Fir", "Hemlock", "Larch", "Maple", "Pine", "Spruce", "Unknown",
-                "Hectares", "M3_175"]
-for idField in lstNewFields:
-    if not arcpy.ListFields(inputVRI, idField):
-        arcpy.AddField_management(inputVRI, idField, "DOUBLE", 8, "", "", "", "NULLABLE",
-                                  "NON_REQUIRED", "")
-        arcpy.AddMessage('    ' + idField + ' added')
-    else:
-        arcpy.AddMessage('    ' + idField + ' exists - skipping')
-
-# Create featurelayer for this script from the input featureclass
-inputLayer = 'inputFeatureLayer'
-arcpy.AddMessage('Creating ' + inputLayer + ' ...'),
-arcpy.MakeFeatureLayer_management(inputVRI, inputLayer)
-arcpy.AddMessage(' Done!')
-
-# Set defaults for new fields
-arcpy.AddMessage('Setting defaults for volume tabulation fields in VRI table... ')
-for idField in lstNewFields:
-    arcpy.CalculateField_management(inputLayer, idField, 0, "VB")
-    arcpy.AddMessage('    defaults for ' + idField + ' field set')
-
-# Populate new fields
-arcpy.AddMessage('Populating volume tabulation fields in VRI table... ')
-uc = arcpy.UpdateCursor(inputVRI)
-uc.reset()
-row = uc.next()
-i = 1
-while row:
-    Ha = row.getValue('GEOMETRY_Area') / 10000
-    DR = row.getValue('dr_vph175')  # Alder
-    if DR is None:
-        DR = 0
-    AT = row.getValue('at_vph175')  # Aspen
-    if AT is None:
-        AT = 0
-    B = row.getValue('b_vph175')  # Balsam
-    if B is None:
-        B = 0
-    BA = row.getValue('ba_vph175')
-    if BA is None:
-        BA = 0
-    BG = row.getValue('bg_vph175')
-    if BG is None:
-        BG = 0
-    BL = row.getValue('bl_vph175')
-    if BL is None:
-        BL = 0
-    EP = row.getValue('ep_vph175')  # Birch
-    if EP is None:
-        EP = 0
-    CW = row.getValue('cw_vph175')  # Cedar
-    if CW is None:
-        CW = 0
-    AC = row.getValue('ac_vph175')  # CtWood
-    if AC is None:
-        AC = 0
-    YC = row.getValue('yc_vph175')  # Cypress
-    if YC is None:
-        YC = 0
-    FD = row.getValue('fd_vph175')  # Fir
-    if FD is None:
-        FD = 0
-    H = row.getValue('h_vph175')  # Hemlock
-    if H is None:
-        H = 0
-    HW = row.getValue('hw_vph175')
-    if HW is None:
-        HW = 0
-    HM = row.getValue('hm_vph175')
-    if HM is None:
-        HM = 0
-    LA = row.getValue('la_vph175')  # Larch
-    if LA is None:
-        LA = 0
-    MB = row.getValue('mb_vph175')  # Maple
-    if MB is None:
-        MB = 0
-    PA = row.getValue('pa_vph175')  # Pine
-    if PA is None:
-        PA = 0
-    PF = row.getValue('pf_vph175')
-    if PF is None:
-        PF = 0
-    PL = row.getValue('pl_vph175')
-    if PL is None:
-        PL = 0
-    PLI = row.getValue('pli_vph175')
-    if PLI is None:
-        PLI = 0
-    PW = row.getValue('pw_vph175')
-    if PW is None:
-        PW = 0
-    PY = row.getValue('py_vph175')
-    if PY is None:
-        PY = 0
-    S = row.getValue('s_vph175')  # Spruce
-    if S is None:
-        S = 0
-    SE = row.getValue('se_vph175')
-    if SE is None:
-        SE = 0
-    SS = row.getValue('ss_vph175')
-    if SS is None:
-        SS = 0
-    SW = row.getValue('sw_vph175')
-    if SW is None:
-        SW = 0
-    VPH = row.getValue('vph175')
-    if VPH is None:
-        VPH = 0
-    TOT = (DR + AT + B + BA + BG + BL + EP + CW + YC + AC + FD + H + HM + HW + LA + MB +
-           PA + PF + PL + PLI + PW + PY + S + SE + SS + SW)
-    XZ = round((VPH - TOT), 0)  # Unknown or other speces
-    row.setValue('Alder', DR * Ha)
-    row.setValue('Aspen', AT * Ha)
-    row.setValue('Balsam', (B + BA + BG + BL) * Ha)
-    row.setValue('Birch', EP * Ha)
-    row.setValue('Cedar', CW * Ha)
-    row.setValue('CtWood', AC * Ha)
-    row.setValue('Cypress', YC * Ha)
-    row.setValue('Fir', FD * Ha)
-    row.setValue('Hemlock', (H + HM + HW) * Ha)
-    row.setValue('Larch', LA * Ha)
-    row.setValue('Maple', MB * Ha)
-    row.setValue('Pine', (PA + PF + PL + PLI + PW + PY) * Ha)
-    row.setValue('Spruce', (S + SE + SS + SW) * Ha)
-    row.setValue('Unknown', XZ * Ha)
-    row.setValue('Hectares', Ha)
-    row.setValue('M3_175', TOT * Ha)
-    uc.updateRow(row)
-    row = uc.next()
-    i += 1
-arcpy.AddMessage('    ' + str(i) + ' rows updated!')
-del uc  # release table
-del row
-arcpy.AddMessage('------------------------------------------------------------')
+    # Add fields to input table and populate them
+    run_tool('AddTotVolFieldsToVRI', args, totals_job(args.levels))
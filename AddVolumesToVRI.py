@@ -0,0 +1,64 @@
+"""
+Copyright 2011-16 Province of British Columbia
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+# -------------------------------------------------------------------------
+# Tool Name: Add Volume Fields to VRI file geodatabase table
+# Source Name: AddVolumesToVRI.py
+# Version: ArcGIS 10.3.1, Python 2.7.8
+# Author:  British Columbia Ministry of Forests and Range
+#          Coast Forest Region Geomatic Services
+#
+# Required Arguments: input table (VRI having VEG_COMP(2009) field names)
+# Optional Arguments: --levels 125 175 225 (utilization levels, default 175)
+#                     --engine row|numpy (default row)
+#                     --species-rules FILE (species,pattern CSV rules)
+#                     --chunk-size N or --memory-mb M (stream in chunks)
+#                     --workers N (compute OBJECTID ranges in N processes)
+#                     --incremental (only recompute rows whose inputs changed)
+#                     --pipeline (overlap reading, computing and writing)
+#                     --checkpoint FILE (resume an interrupted run)
+#                     --area-from-geometry (derive area from the geometry;
+#                     automatic when GEOMETRY_Area is missing)
+#                     --qa [--qa-sample N] (data quality checks)
+#                     --progress-every N, --report FILE, --profile FILE
+#                     --sidecar DIR [--sidecar-key FIELD] (write the
+#                     volumes to .npy column files, not the table)
+#                     --summary-by FIELD ... --summary-output OUT
+#                     (sum group volumes by key fields, e.g. TSA_NUMBER)
+#                     --summary-only (write the summary, not the volumes)
+#                     --skip-vph (write the species group totals only)
+#
+# Description: This tool combines AddVphFieldsToVRI and
+#              AddTotVolFieldsToVRI.  The species codes, species volumes
+#              and GEOMETRY_Area are read once and the volume per hectare
+#              by species fields and the volume (m3) by species group
+#              fields are written in the same row update, at the primary
+#              utilization level (17.5 cm dbh.)
+# Created: October 17, 2026
+# ------------------------------------------------------------------------
+"""
+
+from vri_volumes import build_parser, run_tool, volumes_job
+
+if __name__ == '__main__':
+    # Get required input table
+    parser = build_parser('Add volume per hectare and total volume fields to a VRI table')
+    parser.add_argument('--skip-vph', action='store_true',
+                        help='do not write the species vph fields, only the group totals')
+    args = parser.parse_args()
+
+    # Add fields to input table and populate them
+    run_tool('AddVolumesToVRI', args,
+             volumes_job(not args.skip_vph, args.levels, args.species_rules))
@@ -0,0 +1,80 @@
+"""
+Shared fixtures of the VRI volume tool tests.
+
+The tools are run on synthetic SQLite tables written by the
+vri_benchmark generator, through the same parser and run_tool call as
+the tool scripts.
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vri_batch import TOOLS, tool_job, tool_parser  # noqa: E402
+from vri_benchmark import write_sqlite_table  # noqa: E402
+from vri_volumes import run_tool  # noqa: E402
+
+ROWS = 3000
+
+
+@pytest.fixture(scope='session')
+def source_table(tmp_path_factory):
+    """A synthetic VRI table, written once; copy it before changing it."""
+    path = str(tmp_path_factory.mktemp('source') / 'vri.sqlite')
+    return write_sqlite_table(path, ROWS, seed=7)
+
+
+@pytest.fixture
+def copy_table(source_table, tmp_path):
+    """Return a function making a fresh copy of the source table."""
+    counter = [0]
+
+    def copy(table=None):
+        path, name = (table or source_table).split('|')
+        counter[0] += 1
+        target = str(tmp_path / ('vri_%d.sqlite' % counter[0]))
+        shutil.copy(path, target)
+        return target + '|' + name
+    return copy
+
+
+def run(tool, table, *options):
+    """Run a tool ('vph', 'totals' or 'volumes') with command line options."""
+    args = tool_parser(tool).parse_args([table] + list(options))
+    return run_tool(TOOLS[tool][0], args, tool_job(tool, args))
+
+
+def read_rows(table, fields):
+    """Return the rows of fields of a SQLite table, in rowid order."""
+    path, name = table.split('|')
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute(
+            'SELECT %s FROM "%s" ORDER BY rowid' %
+            (', '.join('"%s"' % field for field in fields), name)).fetchall()
+    finally:
+        connection.close()
+
+
+def table_fields(table):
+    """Return the field names of a SQLite table."""
+    path, name = table.split('|')
+    connection = sqlite3.connect(path)
+    try:
+        return [row[1] for row in connection.execute('PRAGMA table_info("%s")' % name)]
+    finally:
+        connection.close()
+
+
+def execute(table, sql, params=()):
+    """Run one SQL statement on a SQLite table file; {table} is its name."""
+    path, name = table.split('|')
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute(sql.format(table='"%s"' % name), params)
+    connection.close()
@@ -0,0 +1,79 @@
+"""
+Reference implementation of the original (2014) AddVphFieldsToVRI and
+AddTotVolFieldsToVRI scripts, written independently of vri_species.
+
+AddVphFieldsToVRI set every species field to 0, then, species by
+species, selected the rows whose SPECIES_CD_<slot> matched the species
+query, for slots 6 down to 1, and calculated the field from that slot's
+volume, so the lowest matching slot wins (a null volume included).
+vph175 is the sum of the six slot volumes, nulls as 0.  The cottonwood
+field was misspelt ac_vph1git75; it is ac_vph175 here.
+
+AddTotVolFieldsToVRI summed the species fields into groups, Unknown
+being round(vph175 - named species total) with Python 2 rounding.
+"""
+
+from decimal import ROUND_HALF_UP, Decimal
+
+# (field, query) in the order of the original passes; 'X%' is LIKE
+QUERIES = [
+    ('ac_vph175', 'AC%'), ('at_vph175', 'AT%'), ('b_vph175', 'B'), ('ba_vph175', 'BA'),
+    ('bg_vph175', 'BG'), ('bl_vph175', 'BL'), ('cw_vph175', 'C%'), ('dr_vph175', 'D%'),
+    ('ep_vph175', 'E%'), ('fd_vph175', 'F%'), ('h_vph175', 'H'), ('hm_vph175', 'HM'),
+    ('hw_vph175', 'HW'), ('la_vph175', 'L%'), ('mb_vph175', 'M%'), ('pa_vph175', 'PA'),
+    ('pf_vph175', 'PF'), ('pl_vph175', 'PL'), ('pli_vph175', 'PLI'), ('pw_vph175', 'PW'),
+    ('py_vph175', 'PY'), ('s_vph175', 'S'), ('se_vph175', 'SE'), ('ss_vph175', 'SS'),
+    ('sw_vph175', 'SW'), ('yc_vph175', 'Y%'),
+]
+VPH_FIELDS = [field for field, query in QUERIES] + ['vph175']
+CODE_FIELDS = ['SPECIES_CD_%d' % slot for slot in range(1, 7)]
+VOLUME_FIELDS = ['live_vol_per_ha_spp%d_175' % slot for slot in range(1, 7)]
+
+GROUPS = [
+    ('Alder', ['dr']), ('Aspen', ['at']), ('Balsam', ['b', 'ba', 'bg', 'bl']),
+    ('Birch', ['ep']), ('Cedar', ['cw']), ('CtWood', ['ac']), ('Cypress', ['yc']),
+    ('Fir', ['fd']), ('Hemlock', ['h', 'hm', 'hw']), ('Larch', ['la']), ('Maple', ['mb']),
+    ('Pine', ['pa', 'pf', 'pl', 'pli', 'pw', 'py']), ('Spruce', ['s', 'se', 'ss', 'sw']),
+]
+TOTAL_FIELDS = [group for group, members in GROUPS] + ['Unknown', 'Hectares', 'M3_175']
+# the original TOT expression
+TOT_ORDER = ['dr', 'at', 'b', 'ba', 'bg', 'bl', 'ep', 'cw', 'yc', 'ac', 'fd', 'h', 'hm', 'hw',
+             'la', 'mb', 'pa', 'pf', 'pl', 'pli', 'pw', 'py', 's', 'se', 'ss', 'sw']
+
+
+def _selected(code, query):
+    if code is None:
+        return False
+    if query.endswith('%'):
+        return code.startswith(query[:-1])
+    return code == query
+
+
+def original_vph(codes, volumes):
+    """Return the VPH_FIELDS values of one row."""
+    values = dict((field, 0) for field in VPH_FIELDS)
+    for field, query in QUERIES:
+        for slot in [6, 5, 4, 3, 2, 1]:
+            if _selected(codes[slot - 1], query):
+                values[field] = volumes[slot - 1]
+    values['vph175'] = sum(0 if volume is None else volume for volume in volumes)
+    return [values[field] for field in VPH_FIELDS]
+
+
+def original_totals(vph, area):
+    """Return the TOTAL_FIELDS values of one row from its VPH_FIELDS values."""
+    values = dict((field[:-len('_vph175')], 0 if value is None else value)
+                  for field, value in zip(VPH_FIELDS[:-1], vph[:-1]))
+    VPH = 0 if vph[-1] is None else vph[-1]
+    Ha = area / 10000.0
+    TOT = 0
+    for species in TOT_ORDER:
+        TOT += values[species]
+    XZ = float(Decimal(VPH - TOT).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    result = []
+    for group, members in GROUPS:
+        total = values[members[0]]
+        for species in members[1:]:
+            total += values[species]
+        result.append(total * Ha)
+    return result + [XZ * Ha, Ha, TOT * Ha]
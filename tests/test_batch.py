@@ -0,0 +1,60 @@
+"""
+Batch runs over many datasets.
+"""
+
+import json
+
+import pytest
+
+from conftest import read_rows, run
+from original import TOTAL_FIELDS
+from vri_batch import dataset_name, read_manifest, run_batch
+from vri_benchmark import write_sqlite_table
+
+
+@pytest.fixture
+def tables(tmp_path):
+    """Three tables of different sizes and one that does not exist."""
+    return [write_sqlite_table(str(tmp_path / 'small.sqlite'), 100, seed=1),
+            write_sqlite_table(str(tmp_path / 'large.sqlite'), 900, seed=2),
+            str(tmp_path / 'missing.sqlite') + '|veg_comp',
+            write_sqlite_table(str(tmp_path / 'medium.sqlite'), 400, seed=3)]
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_batch_runs_largest_first_past_failures(tables, tmp_path, jobs):
+    status = str(tmp_path / 'status.json')
+    records = run_batch('volumes', tables, ['--report', str(tmp_path / '{name}.json')], jobs,
+                        status)
+    with open(status) as f:
+        assert json.load(f) == records
+    by_name = dict((record['name'], record) for record in records)
+    assert sorted(by_name) == ['large_veg_comp', 'medium_veg_comp', 'missing_veg_comp',
+                               'small_veg_comp']
+    assert by_name['missing_veg_comp']['status'] == 'failed'
+    assert by_name['missing_veg_comp']['size'] is None
+    assert by_name['missing_veg_comp']['error']
+    for name, rows in (('small', 100), ('medium', 400), ('large', 900)):
+        record = by_name[name + '_veg_comp']
+        assert (record['status'], record['rows'], record['size']) == ('ok', rows, rows)
+        # {name} is replaced in option values
+        assert (tmp_path / (name + '_veg_comp.json')).exists()
+    if jobs == 1:
+        assert [record['name'] for record in records] == [
+            'large_veg_comp', 'medium_veg_comp', 'small_veg_comp', 'missing_veg_comp']
+
+
+def test_batch_writes_what_the_tool_writes(tables, copy_table):
+    reference = copy_table(tables[0])
+    run('volumes', reference)
+    run_batch('volumes', tables[:1], [])
+    assert read_rows(tables[0], TOTAL_FIELDS) == read_rows(reference, TOTAL_FIELDS)
+
+
+def test_manifest_and_names(tmp_path):
+    manifest = tmp_path / 'manifest.txt'
+    manifest.write_text(u'# tiles\ntiles/092B.gpkg|veg_comp\n\n  tiles/092C.gdb/VEG_COMP  \n')
+    tables = read_manifest(str(manifest))
+    assert tables == ['tiles/092B.gpkg|veg_comp', 'tiles/092C.gdb/VEG_COMP']
+    assert [dataset_name(table) for table in tables] == ['092B_veg_comp', '092C_VEG_COMP']
+    assert dataset_name('C:\\data\\vri.gdb\\VEG_COMP') == 'vri_VEG_COMP'
@@ -0,0 +1,57 @@
+"""
+The benchmark generator and tool run cases.
+"""
+
+import sys
+
+import pytest
+
+from conftest import read_rows
+from original import TOTAL_FIELDS, VPH_FIELDS
+from vri_benchmark import UNKNOWN_CODES, generate_rows, run_case
+from vri_species import SPECIES_SLOTS
+
+
+def test_generator_is_deterministic_and_varied():
+    rows = list(generate_rows(2000, seed=3))
+    assert rows == list(generate_rows(2000, seed=3))
+    assert rows != list(generate_rows(2000, seed=4))
+    codes = [code for row in rows for code in row[:SPECIES_SLOTS]]
+    volumes = [row[SPECIES_SLOTS:2 * SPECIES_SLOTS] for row in rows]
+    assert '' in codes and None in codes
+    assert set(UNKNOWN_CODES) & set(codes)
+    assert set(['HW', 'CW', 'FD', 'PLI', 'SX', 'BL']) <= set(codes)
+    # non-forest polygons and null volumes of species in a slot
+    assert any(all(value is None for value in row) for row in volumes)
+    assert any(code and volume is None
+               for row in rows for code, volume in zip(row[:6], row[6:12]))
+    assert all(row[-1] > 0 for row in rows)
+
+
+@pytest.mark.parametrize('tool,stages', [
+    ('volumes', ['volumes']),
+    ('vph+totals', ['totals', 'vph']),
+    ('vph', ['vph']),
+    ('totals', ['totals']),
+])
+@pytest.mark.parametrize('engine,parts', [('row', ['update']), ('numpy', ['read', 'compute'])])
+def test_case_stages(copy_table, monkeypatch, tool, stages, engine, parts):
+    monkeypatch.setattr(sys, 'stdout', sys.stdout)
+    case = {'rows': 3000, 'backend': 'sqlite', 'tool': tool, 'engine': engine,
+            'mode': 'serial', 'chunk_size': 1000, 'workers': 2, 'table': copy_table()}
+    result = run_case(case)
+    assert result['rows_updated'] == 3000
+    assert sorted(result['stages']) == stages
+    for name in stages:
+        assert set(['schema'] + parts) <= set(result['stages'][name])
+
+
+def test_tool_runs_write_the_same_volumes(copy_table, monkeypatch):
+    monkeypatch.setattr(sys, 'stdout', sys.stdout)
+    tables = {}
+    for tool in ('volumes', 'vph+totals'):
+        tables[tool] = copy_table()
+        run_case({'rows': 3000, 'backend': 'sqlite', 'tool': tool, 'engine': 'row',
+                  'mode': 'chunked', 'chunk_size': 1000, 'workers': 2, 'table': tables[tool]})
+    fields = VPH_FIELDS + TOTAL_FIELDS
+    assert read_rows(tables['volumes'], fields) == read_rows(tables['vph+totals'], fields)
@@ -0,0 +1,77 @@
+"""
+Checkpointed runs resume after the OBJECTID ranges already written.
+"""
+
+import json
+import os
+
+import pytest
+
+import vri_volumes
+from conftest import ROWS, read_rows, run
+from original import TOTAL_FIELDS, VPH_FIELDS
+from vri_species import SPECIES_RULES
+
+OUTPUT_FIELDS = VPH_FIELDS + TOTAL_FIELDS
+
+
+def interrupt_after(monkeypatch, chunks):
+    """Make run_job fail after writing chunks ranges."""
+    run_chunk = vri_volumes.run_chunk
+    calls = []
+
+    def failing_run_chunk(*args, **kwargs):
+        if len(calls) == chunks:
+            raise KeyboardInterrupt
+        calls.append(args[3])
+        return run_chunk(*args, **kwargs)
+    monkeypatch.setattr(vri_volumes, 'run_chunk', failing_run_chunk)
+    return calls
+
+
+@pytest.mark.parametrize('engine', ['row', 'numpy'])
+def test_checkpoint_resumes(copy_table, tmp_path, monkeypatch, engine):
+    table = copy_table()
+    checkpoint = str(tmp_path / 'checkpoint.json')
+    options = ['--engine', engine, '--chunk-size', '400', '--checkpoint', checkpoint]
+    with monkeypatch.context() as patch:
+        written = interrupt_after(patch, 3)
+        with pytest.raises(KeyboardInterrupt):
+            run('volumes', table, *options)
+    with open(checkpoint) as f:
+        done = json.load(f)['done']
+    assert done == [[written[0][0], written[-1][1]]]
+
+    # rows already written are skipped: the rest are updated
+    assert run('volumes', table, *options) == ROWS - 3 * 400
+    assert not os.path.exists(checkpoint)
+    reference = copy_table()
+    run('volumes', reference, '--engine', engine)
+    assert read_rows(table, OUTPUT_FIELDS) == read_rows(reference, OUTPUT_FIELDS)
+
+
+def test_checkpoint_of_another_run_refused(copy_table, tmp_path, monkeypatch):
+    table = copy_table()
+    checkpoint = str(tmp_path / 'checkpoint.json')
+    with monkeypatch.context() as patch:
+        interrupt_after(patch, 1)
+        with pytest.raises(KeyboardInterrupt):
+            run('volumes', table, '--chunk-size', '400', '--checkpoint', checkpoint)
+    with pytest.raises(ValueError):
+        run('vph', table, '--chunk-size', '400', '--checkpoint', checkpoint)
+
+
+def test_checkpoint_with_other_rules_refused(copy_table, tmp_path, monkeypatch):
+    table = copy_table()
+    checkpoint = str(tmp_path / 'checkpoint.json')
+    rules = str(tmp_path / 'rules.csv')
+    with open(rules, 'w') as f:
+        f.write('species,pattern\n' +
+                ''.join('%s,%s\n' % rule for rule in SPECIES_RULES) + 's,SX\n')
+    with monkeypatch.context() as patch:
+        interrupt_after(patch, 1)
+        with pytest.raises(KeyboardInterrupt):
+            run('vph', table, '--chunk-size', '400', '--checkpoint', checkpoint)
+    with pytest.raises(ValueError, match='different run'):
+        run('vph', table, '--chunk-size', '400', '--checkpoint', checkpoint,
+            '--species-rules', rules)
@@ -0,0 +1,163 @@
+"""
+The numpy engine agrees with the row engine, and chunked, parallel and
+pipelined runs write exactly what a serial run writes.
+"""
+
+import shutil
+
+import numpy as np
+import pytest
+
+import vri_parallel
+import vri_pipeline
+from conftest import read_rows, run
+from original import TOTAL_FIELDS, VPH_FIELDS
+from vri_volumes import RunOptions, memory_chunk_size, volumes_job
+
+OUTPUT_FIELDS = VPH_FIELDS + TOTAL_FIELDS
+
+
+def as_array(rows):
+    return np.array([[np.nan if value is None else value for value in row] for row in rows])
+
+
+@pytest.fixture(scope='module')
+def serial_output(source_table, tmp_path_factory):
+    """The volumes written by a serial run of each engine."""
+    output = {}
+    for engine in ('row', 'numpy'):
+        path = str(tmp_path_factory.mktemp('serial') / 'vri.sqlite')
+        shutil.copy(source_table.split('|')[0], path)
+        table = path + '|' + source_table.split('|')[1]
+        run('volumes', table, '--engine', engine)
+        output[engine] = read_rows(table, OUTPUT_FIELDS)
+    return output
+
+
+def test_numpy_agrees_with_row(serial_output):
+    row, numpy = as_array(serial_output['row']), as_array(serial_output['numpy'])
+    species = len(VPH_FIELDS)
+    # species fields are copied from a slot, so equal exactly, nulls included
+    assert np.array_equal(row[:, :species], numpy[:, :species], equal_nan=True)
+    assert np.allclose(row, numpy, rtol=1e-12, atol=0, equal_nan=True)
+
+
+def test_numpy_tools_agree_with_row(copy_table):
+    tables = {}
+    for engine in ('row', 'numpy'):
+        tables[engine] = copy_table()
+        run('vph', tables[engine], '--engine', engine)
+        run('totals', tables[engine], '--engine', engine)
+    row = as_array(read_rows(tables['row'], OUTPUT_FIELDS))
+    numpy = as_array(read_rows(tables['numpy'], OUTPUT_FIELDS))
+    assert np.allclose(row, numpy, rtol=1e-12, atol=0, equal_nan=True)
+
+
+@pytest.mark.parametrize('engine', ['row', 'numpy'])
+@pytest.mark.parametrize('options', [
+    ['--chunk-size', '700'],
+    ['--chunk-size', '1'],
+    ['--memory-mb', '1'],
+])
+def test_chunked_matches_serial(serial_output, copy_table, engine, options):
+    table = copy_table()
+    run('volumes', table, '--engine', engine, *options)
+    assert read_rows(table, OUTPUT_FIELDS) == serial_output[engine]
+
+
+def test_memory_chunk_size():
+    job = volumes_job()
+    row = memory_chunk_size(job, RunOptions('row'), 100)
+    numpy = memory_chunk_size(job, RunOptions('numpy'), 100)
+    assert 0 < row < numpy
+    assert abs(memory_chunk_size(job, RunOptions('row'), 200) - 2 * row) <= 1
+    # fields read for a sink and geometry blobs make the chunks smaller
+    assert memory_chunk_size(job, RunOptions('row', summary_by=['TSA_NUMBER']), 100) < row
+    assert memory_chunk_size(job, RunOptions('row', area_from_geometry=True), 100) < row
+
+
+@pytest.mark.parametrize('engine', ['row', 'numpy'])
+@pytest.mark.parametrize('options', [
+    ['--workers', '2'],
+    ['--workers', '3', '--chunk-size', '400'],
+])
+def test_workers_match_serial(serial_output, copy_table, engine, options):
+    table = copy_table()
+    run('volumes', table, '--engine', engine, *options)
+    assert read_rows(table, OUTPUT_FIELDS) == serial_output[engine]
+
+
+class InlinePool(object):
+    """A process pool stand-in computing each task when its result is fetched."""
+
+    submitted = 0
+
+    def __init__(self, processes):
+        pass
+
+    def apply_async(self, function, args):
+        InlinePool.submitted += 1
+
+        class Result(object):
+            def get(self):
+                return function(*args)
+        return Result()
+
+    def close(self):
+        pass
+
+    def terminate(self):
+        pass
+
+    def join(self):
+        pass
+
+
+def test_workers_bound_ranges_in_flight(serial_output, copy_table, monkeypatch):
+    written = []
+    write_range = vri_parallel.write_range
+
+    def counting_write_range(*args):
+        # ranges submitted and not yet written, this one included
+        written.append(InlinePool.submitted - len(written))
+        return write_range(*args)
+    monkeypatch.setattr(InlinePool, 'submitted', 0)
+    monkeypatch.setattr(vri_parallel.multiprocessing, 'Pool', InlinePool)
+    monkeypatch.setattr(vri_parallel, 'write_range', counting_write_range)
+    table = copy_table()
+    run('volumes', table, '--workers', '2', '--chunk-size', '100')
+    assert len(written) == 30
+    assert max(written) == 2 * 2
+    assert read_rows(table, OUTPUT_FIELDS) == serial_output['row']
+
+
+@pytest.mark.parametrize('engine', ['row', 'numpy'])
+@pytest.mark.parametrize('options', [
+    ['--pipeline'],
+    ['--pipeline', '--chunk-size', '500', '--read-queue-depth', '1', '--write-queue-depth', '3'],
+])
+def test_pipeline_matches_serial(serial_output, copy_table, engine, options):
+    table = copy_table()
+    run('volumes', table, '--engine', engine, *options)
+    assert read_rows(table, OUTPUT_FIELDS) == serial_output[engine]
+
+
+def test_pipeline_error_stops_the_run(copy_table, monkeypatch):
+    compute_read = vri_pipeline.compute_read
+    calls = []
+
+    def failing_compute_read(*args):
+        calls.append(1)
+        if len(calls) == 3:
+            raise RuntimeError('compute failed')
+        return compute_read(*args)
+    monkeypatch.setattr(vri_pipeline, 'compute_read', failing_compute_read)
+    with pytest.raises(RuntimeError, match='compute failed'):
+        run('volumes', copy_table(), '--pipeline', '--chunk-size', '100',
+            '--read-queue-depth', '1', '--write-queue-depth', '1')
+    assert len(calls) == 3
+
+
+def test_pipeline_with_workers_refused(copy_table):
+    with pytest.raises(ValueError):
+        run('volumes', copy_table(), '--pipeline', '--workers', '2')
@@ -0,0 +1,137 @@
+"""
+Polygon areas from GeoPackage and WKB geometry blobs.
+"""
+
+import json
+import sqlite3
+import struct
+
+import numpy as np
+import pytest
+
+import vri_volumes
+from conftest import ROWS, execute, read_rows, run
+from original import TOTAL_FIELDS
+from vri_geometry import polygon_areas
+
+# BC Albers coordinates, large enough to lose precision in naive shoelace sums
+X0, Y0 = 1234567.0, 456789.0
+
+
+def ring(x, y, width, height, order='<', dims=2, clockwise=False, closed=True):
+    points = [(x, y), (x + width, y), (x + width, y + height), (x, y + height)]
+    if closed:
+        points.append((x, y))
+    if clockwise:
+        points.reverse()
+    return struct.pack(order + 'I', len(points)) + b''.join(
+        struct.pack(order + 'd' * dims, *([px, py] + [9.0] * (dims - 2))) for px, py in points)
+
+
+def polygon(rings, order='<', code=3):
+    return (b'\x01' if order == '<' else b'\x00') + \
+        struct.pack(order + 'II', code, len(rings)) + b''.join(rings)
+
+
+def multipolygon(parts, order='<'):
+    return polygon(parts, order, code=6)
+
+
+def geopackage(wkb, envelope=True):
+    header = b'GP\x00' + struct.pack('B', 1 | (1 << 1 if envelope else 0)) + \
+        struct.pack('<i', 3005)
+    if envelope:
+        header += struct.pack('<4d', X0, X0 + 1000, Y0, Y0 + 1000)
+    return header + wkb
+
+
+def test_polygon_with_hole():
+    outer = ring(X0, Y0, 300.0, 200.0)
+    hole = ring(X0 + 10, Y0 + 10, 5.0, 4.0, clockwise=True)
+    assert polygon_areas([polygon([outer, hole])])[0] == pytest.approx(60000.0 - 20.0, abs=1e-6)
+
+
+@pytest.mark.parametrize('order', ['<', '>'])
+@pytest.mark.parametrize('dims,code', [(2, 3), (3, 1003), (3, 0x80000003), (4, 3003)])
+def test_byte_order_and_dimensions(order, dims, code):
+    wkb = polygon([ring(X0, Y0, 30.0, 40.0, order, dims)], order, code)
+    assert polygon_areas([wkb])[0] == pytest.approx(1200.0, abs=1e-6)
+
+
+def test_multipolygon_in_geopackage_blob():
+    part1 = polygon([ring(X0, Y0, 100.0, 100.0)])
+    part2 = polygon([ring(X0 + 500, Y0, 30.0, 40.0, clockwise=True),
+                     ring(X0 + 501, Y0 + 1, 2.0, 3.0)])
+    blobs = [geopackage(multipolygon([part1, part2]), envelope)
+             for envelope in (True, False)]
+    assert polygon_areas(blobs) == pytest.approx([10000.0 + 1200.0 - 6.0] * 2, abs=1e-6)
+
+
+def test_unclosed_ring_null_and_point():
+    point = b'\x01' + struct.pack('<Idd', 1, X0, Y0)
+    areas = polygon_areas([polygon([ring(X0, Y0, 10.0, 20.0, closed=False)]), None, point])
+    assert areas[0] == pytest.approx(200.0, abs=1e-6)
+    assert np.isnan(areas[1])
+    assert areas[2] == 0.0
+
+
+@pytest.fixture
+def geometry_table(copy_table):
+    """A copy of the source table with a registered polygon geometry column."""
+    table = copy_table()
+    path, name = table.split('|')
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute('ALTER TABLE %s ADD COLUMN geom BLOB' % name)
+        rows = connection.execute('SELECT fid, GEOMETRY_Area FROM %s' % name).fetchall()
+        for fid, area in rows:
+            # a square of the polygon area, with a hole of 1 m2 in odd rows
+            side = (area + fid % 2) ** 0.5
+            rings = [ring(X0 + fid, Y0, side, side, order='<>'[fid % 2])]
+            if fid % 2:
+                rings.append(ring(X0 + fid + 0.5, Y0 + 0.5, 1.0, 1.0, '>', clockwise=True))
+            connection.execute('UPDATE %s SET geom = ? WHERE fid = ?' % name,
+                               (geopackage(polygon(rings, '<>'[fid % 2])), fid))
+        connection.execute('CREATE TABLE gpkg_geometry_columns (table_name TEXT, '
+                           'column_name TEXT, geometry_type_name TEXT, srs_id INTEGER, '
+                           'z TINYINT, m TINYINT)')
+        connection.execute("INSERT INTO gpkg_geometry_columns VALUES (?, 'geom', 'POLYGON', "
+                           "3005, 0, 0)", (name,))
+    connection.close()
+    return table
+
+
+@pytest.mark.parametrize('engine', ['row', 'numpy'])
+def test_area_from_geometry(geometry_table, copy_table, engine):
+    run('volumes', geometry_table, '--engine', engine, '--area-from-geometry')
+    reference = copy_table(geometry_table)
+    run('volumes', reference, '--engine', engine)
+    from_geometry = np.array(read_rows(geometry_table, TOTAL_FIELDS), dtype=float)
+    from_field = np.array(read_rows(reference, TOTAL_FIELDS), dtype=float)
+    assert np.allclose(from_geometry, from_field, rtol=1e-9, atol=0, equal_nan=True)
+
+
+@pytest.mark.parametrize('options', [['--area-from-geometry'], ['--qa']])
+def test_row_engine_reads_in_ranges(geometry_table, monkeypatch, options):
+    key_ranges = []
+    run_chunk = vri_volumes.run_chunk
+
+    def recording_run_chunk(*args, **kwargs):
+        key_ranges.append(args[3])
+        return run_chunk(*args, **kwargs)
+    monkeypatch.setattr(vri_volumes, 'run_chunk', recording_run_chunk)
+    run('volumes', geometry_table, *options)
+    assert key_ranges == [(1, ROWS + 1)]
+
+
+@pytest.mark.parametrize('engine', ['row', 'numpy'])
+def test_null_geometry(geometry_table, tmp_path, engine):
+    execute(geometry_table, 'UPDATE {table} SET geom = NULL WHERE fid IN (5, 17)')
+    report = str(tmp_path / 'report.json')
+    run('volumes', geometry_table, '--engine', engine, '--area-from-geometry', '--qa',
+        '--report', report)
+    with open(report) as f:
+        zero_area = json.load(f)['results']['qa']['zero_area']
+    assert zero_area == {'polygons': 2, 'sample': [5, 17]}
+    totals = read_rows(geometry_table, TOTAL_FIELDS)
+    assert totals[4] == totals[16] == (None,) * len(TOTAL_FIELDS)
@@ -0,0 +1,46 @@
+"""
+Incremental runs only recompute rows whose inputs changed.
+"""
+
+import pytest
+
+from conftest import ROWS, execute, read_rows, run
+from original import TOTAL_FIELDS, VPH_FIELDS
+
+OUTPUT_FIELDS = VPH_FIELDS + TOTAL_FIELDS
+
+
+def edit(table):
+    execute(table, 'UPDATE {table} SET live_vol_per_ha_spp1_175 = 123.0 WHERE rowid = 42')
+    execute(table, "UPDATE {table} SET SPECIES_CD_2 = 'HW' WHERE rowid = 1500")
+    execute(table, 'UPDATE {table} SET GEOMETRY_Area = 777.0 WHERE rowid = 2500')
+
+
+@pytest.mark.parametrize('engine', ['row', 'numpy'])
+def test_incremental_skips_unchanged_rows(copy_table, engine):
+    table = copy_table()
+    options = ['--engine', engine, '--incremental', '--chunk-size', '1000']
+    assert run('volumes', table, *options) == ROWS
+    assert run('volumes', table, *options) == 0
+
+    edit(table)
+    assert run('volumes', table, *options) == 3
+    reference = copy_table()
+    edit(reference)
+    run('volumes', reference, '--engine', engine)
+    assert read_rows(table, OUTPUT_FIELDS) == read_rows(reference, OUTPUT_FIELDS)
+
+
+def test_fingerprints_agree_across_engines(copy_table):
+    table = copy_table()
+    assert run('volumes', table, '--incremental') == ROWS
+    assert run('volumes', table, '--incremental', '--engine', 'numpy') == 0
+
+
+def test_tools_keep_their_own_fingerprints(copy_table):
+    table = copy_table()
+    assert run('vph', table, '--incremental') == ROWS
+    assert run('totals', table, '--incremental') == ROWS
+    execute(table, 'UPDATE {table} SET GEOMETRY_Area = 777.0 WHERE rowid = 7')
+    assert run('vph', table, '--incremental') == 0
+    assert run('totals', table, '--incremental') == 1
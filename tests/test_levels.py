@@ -0,0 +1,49 @@
+"""
+Several utilization levels computed in one pass.
+"""
+
+import pytest
+
+from conftest import execute, read_rows, run, table_fields
+from vri_species import live_vol_fields, total_vol_fields, vph_fields
+from vri_volumes import level_total_fields, level_vph_fields
+
+
+@pytest.fixture
+def two_level_table(copy_table):
+    """A copy of the source table with 12.5 cm volumes, 1.2 times the 17.5 cm ones."""
+    table = copy_table()
+    for field, source in zip(live_vol_fields('125'), live_vol_fields('175')):
+        execute(table, 'ALTER TABLE {table} ADD COLUMN "%s" REAL' % field)
+        execute(table, 'UPDATE {table} SET "%s" = 1.2 * "%s"' % (field, source))
+    return table
+
+
+def test_level_fields():
+    fields = level_vph_fields(('125', '175')) + level_total_fields(('125', '175'))
+    assert fields[:3] == ['ac_vph125', 'at_vph125', 'b_vph125']
+    assert 'vph125' in fields and 'vph175' in fields
+    assert 'Unknown_125' in fields and 'Unknown' in fields
+    assert 'M3_125' in fields and 'M3_175' in fields
+    assert fields.count('Hectares') == 1
+    assert len(fields) == len(set(fields))
+
+
+@pytest.mark.parametrize('engine', ['row', 'numpy'])
+def test_levels_match_single_level_runs(two_level_table, copy_table, engine):
+    table = copy_table(two_level_table)
+    run('volumes', table, '--engine', engine, '--levels', '175', '125')
+    added = [field for field in table_fields(table) if field not in table_fields(two_level_table)]
+    assert added == level_vph_fields(('125', '175')) + level_total_fields(('125', '175'))
+    for level, hectares in (('125', False), ('175', True)):
+        single = copy_table(two_level_table)
+        run('volumes', single, '--engine', engine, '--levels', level)
+        fields = vph_fields(level) + total_vol_fields(level, hectares)
+        assert read_rows(table, fields) == read_rows(single, fields)
+    for m3_125, m3_175 in read_rows(table, ['M3_125', 'M3_175']):
+        assert m3_125 == pytest.approx(1.2 * m3_175, rel=1e-9, abs=1e-9)
+
+
+def test_level_without_volumes_refused(copy_table):
+    with pytest.raises(ValueError):
+        run('volumes', copy_table(), '--levels', '125', '175')
@@ -0,0 +1,110 @@
+"""
+The row engine reproduces the original scripts' output exactly.
+"""
+
+import sqlite3
+
+import pytest
+
+from conftest import execute, read_rows, run, table_fields
+from original import (CODE_FIELDS, TOTAL_FIELDS, VOLUME_FIELDS, VPH_FIELDS, original_totals,
+                      original_vph)
+from vri_benchmark import input_fields, write_sqlite_table
+from vri_species import AREA_FIELD
+
+
+def expected_vph(table):
+    rows = read_rows(table, CODE_FIELDS + VOLUME_FIELDS)
+    return [tuple(original_vph(row[:6], row[6:])) for row in rows]
+
+
+def expected_totals(table):
+    rows = read_rows(table, VPH_FIELDS + [AREA_FIELD])
+    return [tuple(original_totals(row[:-1], row[-1])) for row in rows]
+
+
+@pytest.fixture
+def handmade_table(tmp_path):
+    """A table of rows picked to show which slot sets a species field."""
+    table = write_sqlite_table(str(tmp_path / 'handmade.sqlite'), 0)
+    rows = [
+        # FD and FDI both match F%: the lowest slot wins, also with a null volume
+        ['FDI', 'HW', 'FD', '', '', '', 40.0, 30.0, 20.0, None, None, None, 10000.0],
+        [None, 'FD', 'CW', 'FDI', '', '', 5.0, None, 25.0, 12.0, None, None, 20000.0],
+        # cottonwood, written to ac_vph175
+        ['ACT', 'AC', 'DR', None, None, None, 11.0, 22.0, 33.0, None, None, None, 5000.0],
+        # PL and PLI are different species; PLI is not a PL% code
+        ['PLI', 'PL', 'SX', 'S', 'SE', 'SW', 1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 12345.6],
+        # Unknown rounded half away from zero: 12.5 - 10 rounds to 3
+        ['HW', 'X', '', '', '', '', 10.0, 2.5, None, None, None, None, 15000.0],
+        # a volume in a blank slot only counts in vph175
+        ['', 'BL', None, None, None, None, 7.0, 8.0, None, None, None, None, 800.0],
+        # no species, no volumes
+        [None] * 12 + [100.0],
+    ]
+    path, name = table.split('|')
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.executemany('INSERT INTO %s (%s) VALUES (%s)' % (
+            name, ', '.join('"%s"' % field for field in input_fields()),
+            ', '.join('?' * len(input_fields()))), rows)
+    connection.close()
+    return table
+
+
+def test_vph_matches_original(copy_table):
+    table = copy_table()
+    run('vph', table)
+    assert read_rows(table, VPH_FIELDS) == expected_vph(table)
+
+
+def test_slot_precedence(handmade_table):
+    run('vph', handmade_table)
+    vph = read_rows(handmade_table, VPH_FIELDS)
+    assert vph == expected_vph(handmade_table)
+    fields = dict((field, i) for i, field in enumerate(VPH_FIELDS))
+    assert vph[0][fields['fd_vph175']] == 40.0
+    assert vph[1][fields['fd_vph175']] is None
+    assert vph[2][fields['ac_vph175']] == 11.0
+    assert vph[3][fields['pl_vph175']] == 2.0
+    assert vph[3][fields['pli_vph175']] == 1.0
+    assert vph[5][fields['vph175']] == 15.0
+
+
+def test_totals_match_original(copy_table):
+    table = copy_table()
+    run('vph', table)
+    run('totals', table)
+    assert read_rows(table, TOTAL_FIELDS) == expected_totals(table)
+
+
+def test_unknown_rounds_half_away_from_zero(handmade_table):
+    run('vph', handmade_table)
+    run('totals', handmade_table)
+    unknown = TOTAL_FIELDS.index('Unknown')
+    totals = read_rows(handmade_table, TOTAL_FIELDS)
+    assert totals == expected_totals(handmade_table)
+    # 12.5 - 10 rounds to 3
+    assert totals[4][unknown] == 3.0 * 1.5
+    # a stale vph175 below the species total: 7.5 - 10 rounds to -3
+    execute(handmade_table, 'UPDATE {table} SET vph175 = 7.5 WHERE rowid = 5')
+    run('totals', handmade_table)
+    totals = read_rows(handmade_table, TOTAL_FIELDS)
+    assert totals == expected_totals(handmade_table)
+    assert totals[4][unknown] == -3.0 * 1.5
+
+
+def test_volumes_match_vph_then_totals(copy_table):
+    table = copy_table()
+    run('volumes', table)
+    assert read_rows(table, VPH_FIELDS) == expected_vph(table)
+    assert read_rows(table, TOTAL_FIELDS) == expected_totals(table)
+
+
+def test_volumes_skip_vph(copy_table):
+    table = copy_table()
+    reference = copy_table()
+    run('volumes', table, '--skip-vph')
+    run('volumes', reference)
+    assert not set(VPH_FIELDS) & set(table_fields(table))
+    assert read_rows(table, TOTAL_FIELDS) == read_rows(reference, TOTAL_FIELDS)
@@ -0,0 +1,78 @@
+"""
+Data quality checks evaluated in the volume pass.
+"""
+
+import json
+
+import pytest
+
+from conftest import execute, read_rows, run
+from original import TOTAL_FIELDS
+from vri_species import AREA_FIELD, LIVE_VOL_FIELDS, SPECIES_CD_FIELDS
+
+SAMPLE = 5
+
+
+@pytest.fixture
+def qa_table(copy_table):
+    """A copy of the source table with vph fields and some failing polygons."""
+    table = copy_table()
+    run('vph', table)
+    # a vph total below the species total: Unknown is negative
+    execute(table, 'UPDATE {table} SET vph175 = 0 WHERE rowid % 97 = 0')
+    # a vph total far above the species total: Unknown is large
+    execute(table, 'UPDATE {table} SET vph175 = vph175 + 1000 WHERE rowid % 89 = 0')
+    # a volume with no species code
+    execute(table, "UPDATE {table} SET SPECIES_CD_2 = ' ', live_vol_per_ha_spp2_175 = 5 "
+                   "WHERE rowid % 83 = 0")
+    execute(table, 'UPDATE {table} SET GEOMETRY_Area = 0 WHERE rowid % 79 = 0')
+    execute(table, 'UPDATE {table} SET GEOMETRY_Area = NULL WHERE rowid % 73 = 0')
+    return table
+
+
+def expected_checks(table):
+    """Evaluate each check on the table rows written by the totals tool."""
+    fields = (['fid', 'vph175', AREA_FIELD, 'Unknown', 'M3_175'] + SPECIES_CD_FIELDS +
+              LIVE_VOL_FIELDS)
+    failed = dict((check, []) for check in ('unknown_negative', 'unknown_large',
+                                            'slot_sum_mismatch', 'null_species_volume',
+                                            'zero_area'))
+    for row in read_rows(table, fields):
+        key, vph, area, unknown, m3 = row[:5]
+        codes, vols = row[5:11], row[11:]
+        if unknown is not None and unknown < 0:
+            failed['unknown_negative'].append(key)
+        if m3 and m3 > 0 and unknown > 0.5 * m3:
+            failed['unknown_large'].append(key)
+        if abs(sum(vol or 0 for vol in vols) - (vph or 0)) > 0.01:
+            failed['slot_sum_mismatch'].append(key)
+        if any((code is None or not code.strip()) and vol for code, vol in zip(codes, vols)):
+            failed['null_species_volume'].append(key)
+        if area is None or area <= 0:
+            failed['zero_area'].append(key)
+    return dict((check, {'polygons': len(keys), 'sample': sorted(keys)[:SAMPLE]})
+                for check, keys in failed.items())
+
+
+@pytest.mark.parametrize('engine', ['row', 'numpy'])
+@pytest.mark.parametrize('options', [[], ['--chunk-size', '700'], ['--workers', '2']])
+def test_qa_checks(qa_table, copy_table, tmp_path, engine, options):
+    table = copy_table(qa_table)
+    report = str(tmp_path / 'report.json')
+    run('totals', table, '--engine', engine, '--qa', '--qa-sample', str(SAMPLE),
+        '--report', report, *options)
+    with open(report) as f:
+        results = json.load(f)['results']['qa']
+    assert results == expected_checks(table)
+    assert all(results[check]['polygons'] for check in results)
+    # a null area gives null totals
+    for row in read_rows(table, [AREA_FIELD] + TOTAL_FIELDS):
+        if row[0] is None:
+            assert row[1:] == (None,) * len(TOTAL_FIELDS)
+
+
+def test_qa_checks_of_the_vph_tool(qa_table, capsys):
+    run('vph', qa_table, '--qa')
+    out = capsys.readouterr().out
+    assert 'QA null_species_volume: ' in out
+    assert 'zero_area' not in out and 'unknown_negative' not in out
@@ -0,0 +1,24 @@
+"""
+Only the fields of the read plan are read, and they are checked first.
+"""
+
+import pytest
+
+from conftest import execute, run, table_fields
+
+
+@pytest.mark.parametrize('tool,field,options', [
+    ('vph', 'live_vol_per_ha_spp3_175', []),
+    ('volumes', 'SPECIES_CD_4', ['--engine', 'numpy']),
+    # the source table has no geometry column
+    ('volumes', None, ['--area-from-geometry']),
+    ('volumes', 'TSA_NUMBER', ['--summary-by', 'TSA_NUMBER', '--summary-output', 'x.csv']),
+])
+def test_missing_field_refused_before_schema_change(copy_table, tool, field, options):
+    table = copy_table()
+    if field in table_fields(table):
+        execute(table, 'ALTER TABLE {table} RENAME COLUMN "%s" TO renamed' % field)
+    fields = table_fields(table)
+    with pytest.raises(ValueError, match='no field|no geometry column'):
+        run(tool, table, *options)
+    assert table_fields(table) == fields
@@ -0,0 +1,54 @@
+"""
+Run reports and progress messages.
+"""
+
+import json
+
+import pytest
+
+from conftest import ROWS, run
+
+
+@pytest.mark.parametrize('engine,parts', [('row', ['update']),
+                                          ('numpy', ['read', 'compute', 'write'])])
+def test_run_report(copy_table, tmp_path, engine, parts):
+    table = copy_table()
+    path = str(tmp_path / 'report.json')
+    run('volumes', table, '--engine', engine, '--report', path)
+    with open(path) as f:
+        report = json.load(f)
+    assert report['tool'] == 'AddVolumesToVRI'
+    assert report['input'] == table
+    assert report['options']['engine'] == engine
+    assert [stage['stage'] for stage in report['stages']] == ['schema', 'volumes']
+    volumes = report['stages'][1]
+    assert volumes['rows'] == ROWS
+    assert volumes['rows_per_sec'] > 0
+    for part in parts:
+        assert volumes[part + '_seconds'] >= 0
+    assert report['seconds'] >= volumes['seconds']
+    assert 'GEOMETRY_Area' in report['results']['fields_read']
+    assert report['results']['unmatched_species_codes']
+
+
+@pytest.mark.parametrize('options', [
+    [],
+    ['--chunk-size', '500'],
+    ['--engine', 'numpy', '--chunk-size', '500'],
+])
+def test_progress_messages(copy_table, capsys, options):
+    run('volumes', copy_table(), '--progress-every', '1000', *options)
+    lines = [line for line in capsys.readouterr().out.splitlines()
+             if 'rows processed' in line]
+    # the SQLite update cursor reports once per batch of 10000 rows
+    assert len(lines) == (3 if options else 1)
+    assert lines[-1].strip().startswith('%d rows processed' % ROWS)
+
+
+def test_progress_does_not_change_chunking(copy_table, tmp_path):
+    path = str(tmp_path / 'report.json')
+    run('volumes', copy_table(), '--progress-every', '100', '--report', path)
+    with open(path) as f:
+        volumes = json.load(f)['stages'][1]
+    # one update cursor over the table, as without --progress-every
+    assert 'update_seconds' in volumes and 'read_seconds' not in volumes
@@ -0,0 +1,59 @@
+"""
+Volumes written to sidecar column files instead of the table.
+"""
+
+import numpy as np
+import pytest
+
+from conftest import execute, read_rows, run, table_fields
+from original import TOTAL_FIELDS, VPH_FIELDS
+from vri_sidecar import load_sidecar
+
+OUTPUT_FIELDS = VPH_FIELDS + TOTAL_FIELDS
+
+
+def table_volumes(copy_table):
+    table = copy_table()
+    run('volumes', table)
+    return np.array([[np.nan if value is None else value for value in row]
+                     for row in read_rows(table, OUTPUT_FIELDS)])
+
+
+@pytest.mark.parametrize('engine', ['row', 'numpy'])
+@pytest.mark.parametrize('options', [[], ['--workers', '2', '--chunk-size', '400']])
+def test_sidecar_matches_table(copy_table, tmp_path, engine, options):
+    table = copy_table()
+    fields = table_fields(table)
+    directory = str(tmp_path / 'sidecar')
+    run('volumes', table, '--engine', engine, '--sidecar', directory, *options)
+    assert table_fields(table) == fields
+    keys, columns = load_sidecar(directory)
+    assert keys.tolist() == list(range(1, len(keys) + 1))
+    assert sorted(columns) == sorted(OUTPUT_FIELDS)
+    values = np.column_stack([columns[field] for field in OUTPUT_FIELDS])
+    assert np.allclose(values, table_volumes(copy_table), rtol=1e-12, atol=0, equal_nan=True)
+
+
+def test_sidecar_key(copy_table, tmp_path):
+    table = copy_table()
+    execute(table, 'ALTER TABLE {table} ADD COLUMN FEATURE_ID INTEGER')
+    execute(table, 'UPDATE {table} SET FEATURE_ID = 100000 - 7 * rowid')
+    directory = str(tmp_path / 'sidecar')
+    run('volumes', table, '--sidecar', directory, '--sidecar-key', 'FEATURE_ID')
+    keys, columns = load_sidecar(directory, mmap_mode=None)
+    feature_ids = [row[0] for row in read_rows(table, ['FEATURE_ID'])]
+    assert keys.tolist() == sorted(feature_ids)
+    # rows are looked up by key
+    expected = table_volumes(copy_table)
+    rows = np.searchsorted(keys, feature_ids)
+    found = np.column_stack([columns[field][rows] for field in OUTPUT_FIELDS])
+    assert np.array_equal(found, expected, equal_nan=True)
+
+
+def test_sidecar_null_key_refused(copy_table, tmp_path):
+    table = copy_table()
+    execute(table, 'ALTER TABLE {table} ADD COLUMN FEATURE_ID INTEGER')
+    execute(table, 'UPDATE {table} SET FEATURE_ID = rowid WHERE rowid != 10')
+    with pytest.raises(ValueError, match='null'):
+        run('volumes', table, '--sidecar', str(tmp_path / 'sidecar'), '--sidecar-key',
+            'FEATURE_ID')
@@ -0,0 +1,75 @@
+"""
+Species rules loaded from a file, and species codes matching no rule.
+"""
+
+import json
+
+import pytest
+
+from conftest import ROWS, execute, read_rows, run
+from original import VPH_FIELDS
+from vri_benchmark import UNKNOWN_CODES
+from vri_species import SPECIES_RULES
+
+
+def write_rules(path, extra=''):
+    with open(path, 'w') as f:
+        f.write('species,pattern\n' + ''.join('%s,%s\n' % rule for rule in SPECIES_RULES) + extra)
+    return path
+
+
+def unmatched_codes(table, tmp_path, *options):
+    report = str(tmp_path / 'report.json')
+    run('volumes', table, '--report', report, *options)
+    with open(report) as f:
+        return json.load(f)['results']['unmatched_species_codes']
+
+
+def test_unmatched_codes_agree(copy_table, tmp_path):
+    table = copy_table()
+    execute(table, 'UPDATE {table} SET SPECIES_CD_6 = NULL WHERE rowid % 3 = 0')
+    row = unmatched_codes(copy_table(table), tmp_path, '--chunk-size', '500')
+    numpy = unmatched_codes(copy_table(table), tmp_path, '--engine', 'numpy',
+                            '--chunk-size', '500')
+    assert row == numpy
+    # SX has no rule of its own either
+    assert set(UNKNOWN_CODES) <= set(row)
+    assert not set(row) & set(['', 'None', 'nan'])
+
+
+@pytest.mark.parametrize('engine', ['row', 'numpy'])
+def test_species_rules_file(copy_table, tmp_path, engine):
+    rules = write_rules(str(tmp_path / 'rules.csv'), 's,SX\n')
+    default = copy_table()
+    table = copy_table()
+    assert 'SX' in unmatched_codes(default, tmp_path, '--engine', engine)
+    assert 'SX' not in unmatched_codes(table, tmp_path, '--engine', engine,
+                                       '--species-rules', rules)
+    # only rows with an SX code change, and SX volume goes to s_vph175
+    codes = read_rows(table, ['SPECIES_CD_%d' % slot for slot in range(1, 7)])
+    s_vph = VPH_FIELDS.index('s_vph175')
+    changed = [(code, new) for code, old, new in zip(codes, read_rows(default, VPH_FIELDS),
+                                                     read_rows(table, VPH_FIELDS))
+               if old != new]
+    assert changed
+    assert all('SX' in code for code, vph in changed)
+    assert any(vph[s_vph] for code, vph in changed)
+    # the built in rules written to a file change nothing
+    same = copy_table()
+    run('volumes', same, '--engine', engine, '--species-rules',
+        write_rules(str(tmp_path / 'same.csv')))
+    assert read_rows(same, VPH_FIELDS) == read_rows(default, VPH_FIELDS)
+
+
+def test_unknown_species_refused(copy_table, tmp_path):
+    rules = write_rules(str(tmp_path / 'rules.csv'), 'sx,SX\n')
+    with pytest.raises(ValueError, match='unknown species'):
+        run('vph', copy_table(), '--species-rules', rules)
+
+
+def test_incremental_recomputes_with_new_rules(copy_table, tmp_path):
+    table = copy_table()
+    assert run('vph', table, '--incremental') == ROWS
+    rules = write_rules(str(tmp_path / 'rules.csv'), 's,SX\n')
+    assert run('vph', table, '--incremental', '--species-rules', rules) == ROWS
+    assert run('vph', table, '--incremental', '--species-rules', rules) == 0
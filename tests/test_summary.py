@@ -0,0 +1,78 @@
+"""
+Group volume summaries computed in the volume pass.
+"""
+
+import csv
+import math
+
+import pytest
+
+from conftest import execute, read_rows, run, table_fields
+from original import TOTAL_FIELDS
+
+SUMMED_FIELDS = TOTAL_FIELDS
+
+
+@pytest.fixture
+def keyed_table(copy_table):
+    """A copy of the source table with a TSA_NUMBER key, null for some rows."""
+    table = copy_table()
+    execute(table, 'ALTER TABLE {table} ADD COLUMN TSA_NUMBER TEXT')
+    execute(table, "UPDATE {table} SET TSA_NUMBER = printf('%02d', fid % 4 + 1) "
+                   "WHERE fid % 9 != 0")
+    return table
+
+
+def read_summary(path):
+    with open(path) as f:
+        rows = list(csv.DictReader(f))
+    return dict((row['TSA_NUMBER'], row) for row in rows)
+
+
+def expected_summary(table):
+    """Sum the total fields written to the table by TSA_NUMBER."""
+    groups = {}
+    for row in read_rows(table, ['TSA_NUMBER'] + SUMMED_FIELDS):
+        sums = groups.setdefault(row[0] or '', [0] + [[] for field in SUMMED_FIELDS])
+        sums[0] += 1
+        for values, value in zip(sums[1:], row[1:]):
+            if value is not None:
+                values.append(value)
+    return dict((key, [sums[0]] + [math.fsum(values) for values in sums[1:]])
+                for key, sums in groups.items())
+
+
+@pytest.mark.parametrize('engine', ['row', 'numpy'])
+def test_summary_matches_table(keyed_table, tmp_path, engine):
+    path = str(tmp_path / 'summary.csv')
+    run('volumes', keyed_table, '--engine', engine, '--chunk-size', '700',
+        '--summary-by', 'TSA_NUMBER', '--summary-output', path)
+    summary = read_summary(path)
+    expected = expected_summary(keyed_table)
+    assert sorted(summary) == sorted(expected)
+    for key, values in expected.items():
+        assert int(summary[key]['polygons']) == values[0]
+        assert [float(summary[key][field]) for field in SUMMED_FIELDS] == \
+            pytest.approx(values[1:], rel=1e-12)
+
+
+def test_summary_only_leaves_table_unchanged(keyed_table, tmp_path):
+    fields = table_fields(keyed_table)
+    path = str(tmp_path / 'summary.sqlite') + '|tsa_volumes'
+    run('volumes', keyed_table, '--summary-by', 'TSA_NUMBER', '--summary-output', path,
+        '--summary-only')
+    assert table_fields(keyed_table) == fields
+    counts = {}
+    for (key,) in read_rows(keyed_table, ['TSA_NUMBER']):
+        counts[key] = counts.get(key, 0) + 1
+    assert dict(read_rows(path, ['TSA_NUMBER', 'polygons'])) == counts
+
+
+@pytest.mark.parametrize('args', [
+    ['--summary-by', 'TSA_NUMBER'],
+    ['--summary-only'],
+    ['--summary-by', 'TSA_NUMBER', '--summary-output', 'x.csv', '--incremental'],
+])
+def test_summary_option_errors(keyed_table, args):
+    with pytest.raises(ValueError):
+        run('volumes', keyed_table, *args)
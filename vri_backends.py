@@ -0,0 +1,434 @@
+"""
+Copyright 2011-16 Province of British Columbia
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+# -------------------------------------------------------------------------
+# Source Name: vri_backends.py
+# Version: ArcGIS 10.3.1, Python 2.7.8
+# Author:  British Columbia Ministry of Forests and Range
+#          Coast Forest Region Geomatic Services
+#
+# Description: Storage backends used by the VRI volume tools.  A backend
+#              covers schema inspection, field add, projected read and
+#              batched update of one VRI table.  Reads and updates fetch
+#              only the fields asked for; the geometry is never read
+#              except for the GEOMETRY_AREA pseudo-field.
+#
+#              ArcpyBackend  - geodatabase feature classes and tables
+#                              through arcpy (requires an ArcGIS licence)
+#              SQLiteBackend - GeoPackage / SQLite tables through the
+#                              standard library sqlite3 module
+#
+#              A SQLite table is given as 'path|table', for example
+#              'veg_comp.gpkg|veg_comp_lyr_r1_poly'.
+#
+#              Reads accept the GEOMETRY_AREA pseudo-field, the planar
+#              area of each polygon: arcpy computes it for its SHAPE@AREA
+#              token, SQLiteBackend decodes the GeoPackage geometry blobs
+#              (vri_geometry).
+# ------------------------------------------------------------------------
+"""
+
+import numbers
+import os
+import sqlite3
+
+try:
+    from urllib.request import pathname2url
+except ImportError:
+    from urllib import pathname2url
+
+try:
+    import arcpy
+except ImportError:
+    arcpy = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SQLITE_EXTENSIONS = ('.gpkg', '.sqlite', '.db')
+
+# smallest SQLite rowid, used to start keyset paging through a table
+MIN_ROWID = -9223372036854775808
+
+# pseudo-field read as the planar area of each polygon geometry
+GEOMETRY_AREA = 'SHAPE@AREA'
+
+# OBJECTID field of the arrays written to arcpy tables by ExtendTable
+ARRAY_KEY_FIELD = 'VRI_OID'
+
+
+def add_message(message):
+    """Write a message to the geoprocessing window, or stdout without arcpy."""
+    if arcpy is not None:
+        arcpy.AddMessage(message)
+    else:
+        print(message)
+
+
+def _column_array(values):
+    """Return a float array (NaN for null) or, for text, an object array."""
+    # the few distinct value types are checked, not every value
+    kinds = set(map(type, values))
+    kinds.discard(type(None))
+    if all(issubclass(kind, numbers.Number) for kind in kinds):
+        return np.array(values, dtype=float)
+    return np.array(values, dtype=object)
+
+
+def nan_to_none(values):
+    """Return an array as a list (of row lists if 2-D) with NaN replaced by None.
+
+    Converts a whole chunk in one pass instead of row by row.
+    """
+    objects = values.astype(object)
+    objects[values != values] = None
+    return objects.tolist()
+
+
+def _is_array(rows):
+    return np is not None and isinstance(rows, np.ndarray)
+
+
+def _update_params(keys, rows):
+    """Return executemany parameters: each row's values followed by its key.
+
+    rows are value lists or a float array (NaN for null).
+    """
+    if _is_array(rows):
+        params = np.empty((len(keys), rows.shape[1] + 1), dtype=object)
+        params[:, :-1] = rows
+        params[:, :-1][rows != rows] = None
+        params[:, -1] = keys
+        return params.tolist()
+    return [list(row) + [key] for row, key in zip(rows, keys)]
+
+
+def key_ranges(bounds, chunk_size):
+    """Yield [start, stop) key ranges of chunk_size ids covering bounds."""
+    if bounds is None:
+        return
+    low, high = bounds
+    for start in range(low, high + 1, chunk_size):
+        yield start, min(start + chunk_size, high + 1)
+
+
+def open_backend(table, read_only=False):
+    """Return the backend for a table path.
+
+    read_only opens a SQLite table read-only; arcpy tables are only
+    read through search cursors, which take shared locks.
+    """
+    path = table.split('|')[0]
+    if path.lower().endswith(SQLITE_EXTENSIONS):
+        return SQLiteBackend(table, read_only=read_only)
+    if arcpy is None:
+        raise RuntimeError('arcpy is required to open ' + table)
+    return ArcpyBackend(table)
+
+
+class ArcpyBackend(object):
+    """Geodatabase table accessed through arcpy."""
+
+    def __init__(self, table):
+        self.table = table
+        self.oid_field = arcpy.Describe(table).OIDFieldName
+
+    def _where(self, key_range):
+        if key_range is None:
+            return ""
+        oid = arcpy.AddFieldDelimiters(self.table, self.oid_field)
+        return '%s >= %d AND %s < %d' % (oid, key_range[0], oid, key_range[1])
+
+    def list_fields(self):
+        return [field.name for field in arcpy.ListFields(self.table)]
+
+    def has_field(self, name):
+        return bool(arcpy.ListFields(self.table, name))
+
+    def add_field(self, name, field_type="DOUBLE", length=None):
+        if field_type == "TEXT":
+            arcpy.AddField_management(self.table, name, "TEXT", "", "", length, "", "NULLABLE",
+                                      "NON_REQUIRED", "")
+        else:
+            arcpy.AddField_management(self.table, name, "DOUBLE", 8, "", "", "", "NULLABLE",
+                                      "NON_REQUIRED", "")
+
+    def add_fields(self, names, field_type="DOUBLE", length=None):
+        """Add fields of one type, in one AddFields call where it is available."""
+        if hasattr(arcpy.management, 'AddFields'):
+            arcpy.management.AddFields(self.table, [[name, field_type, "", length]
+                                                    for name in names])
+        else:
+            for name in names:
+                self.add_field(name, field_type, length)
+
+    def geometry_field(self):
+        """Return the shape field of a feature class."""
+        name = getattr(arcpy.Describe(self.table), 'shapeFieldName', None)
+        if not name:
+            raise ValueError(self.table + ' has no geometry')
+        return name
+
+    def key_bounds(self):
+        """Return the lowest and highest OBJECTID, or None for an empty table."""
+        low = high = None
+        with arcpy.da.SearchCursor(self.table, ['OID@']) as sc:
+            for (oid,) in sc:
+                if low is None or oid < low:
+                    low = oid
+                if high is None or oid > high:
+                    high = oid
+        if low is None:
+            return None
+        return low, high
+
+    def count_rows(self):
+        return int(arcpy.GetCount_management(self.table).getOutput(0))
+
+    def read_arrays(self, fields, key_range=None):
+        """Return the OBJECTIDs and a dict of column arrays for fields.
+
+        Null numbers are read as NaN and null strings as ''.  key_range
+        limits the read to OBJECTIDs in [start, stop).
+        """
+        types = dict((field.name.lower(), field.type) for field in arcpy.ListFields(self.table))
+        null_value = dict((field, '' if types.get(field.lower()) == 'String' else float('nan'))
+                          for field in fields)
+        # geometry tokens are only read by FeatureClassToNumPyArray
+        to_array = arcpy.da.FeatureClassToNumPyArray if GEOMETRY_AREA in fields else \
+            arcpy.da.TableToNumPyArray
+        array = to_array(self.table, ['OID@'] + fields, self._where(key_range),
+                         skip_nulls=False, null_value=null_value)
+        return array['OID@'], dict((field, array[field]) for field in fields)
+
+    def read_rows(self, fields, key_range=None):
+        """Return a list of (OBJECTID, values) for the rows in key_range."""
+        with arcpy.da.SearchCursor(self.table, ['OID@'] + fields,
+                                   self._where(key_range)) as sc:
+            return [(row[0], row[1:]) for row in sc]
+
+    def write_rows(self, keys, fields, rows, key_range=None):
+        """Write rows of values to fields by OBJECTID.
+
+        rows are value lists or a float array (NaN for null).  An array
+        is written in bulk by ExtendTable, matched on OBJECTID; value
+        lists through an update cursor, which key_range limits to the
+        OBJECTIDs the keys were read from.
+        """
+        if _is_array(rows):
+            return self._extend(keys, fields, rows)
+        values = dict(zip(keys, rows))
+        count = 0
+        with arcpy.da.UpdateCursor(self.table, ['OID@'] + fields,
+                                   self._where(key_range)) as uc:
+            for row in uc:
+                if row[0] in values:
+                    uc.updateRow([row[0]] + list(values[row[0]]))
+                    count += 1
+        return count
+
+    def _extend(self, keys, fields, rows):
+        # append_only=False updates the existing fields of the matched rows
+        array = np.empty(len(keys), dtype=[(str(ARRAY_KEY_FIELD), np.int32)] +
+                         [(str(field), np.float64) for field in fields])
+        array[ARRAY_KEY_FIELD] = keys
+        for i, field in enumerate(fields):
+            array[field] = rows[:, i]
+        arcpy.da.ExtendTable(self.table, self.oid_field, array, ARRAY_KEY_FIELD, False)
+        return len(keys)
+
+    def update(self, read_fields, write_fields, compute, key_range=None, progress=None):
+        """Write compute(read values) to write_fields for every row.
+
+        The cursor fetches only read_fields and write_fields, not the
+        other attributes or the geometry.  key_range limits the update to
+        OBJECTIDs in [start, stop).  progress, if given, is called with
+        the number of rows updated so far.
+        """
+        size = len(read_fields)
+        count = 0
+        with arcpy.da.UpdateCursor(self.table, list(read_fields) + list(write_fields),
+                                   self._where(key_range)) as uc:
+            for row in uc:
+                values = row[:size]
+                uc.updateRow(list(values) + list(compute(values)))
+                count += 1
+                if progress is not None:
+                    progress(count)
+        return count
+
+    def close(self):
+        pass
+
+
+class SQLiteBackend(object):
+    """GeoPackage or SQLite table accessed through sqlite3."""
+
+    def __init__(self, table, batch_size=10000, timeout=60, read_only=False):
+        if '|' not in table:
+            raise ValueError('SQLite tables are given as path|table: ' + table)
+        path, self.name = table.split('|', 1)
+        if not os.path.exists(path):
+            raise IOError('no such SQLite file: ' + path)
+        self.table = table
+        self.batch_size = batch_size
+        if read_only:
+            try:
+                self.connection = sqlite3.connect('file:%s?mode=ro' % pathname2url(path),
+                                                  timeout=timeout, uri=True)
+            except TypeError:
+                # Python 2 sqlite3 has no URI filenames; query_only (SQLite
+                # 3.8 and later) refuses writes on the connection instead
+                self.connection = sqlite3.connect(path, timeout=timeout)
+                self.connection.execute('PRAGMA query_only = 1')
+        else:
+            self.connection = sqlite3.connect(path, timeout=timeout)
+
+    def _quote(self, name):
+        return '"' + name.replace('"', '""') + '"'
+
+    def list_fields(self):
+        cursor = self.connection.execute('PRAGMA table_info(' + self._quote(self.name) + ')')
+        return [row[1] for row in cursor]
+
+    def has_field(self, name):
+        return name.lower() in [field.lower() for field in self.list_fields()]
+
+    def add_field(self, name, field_type="DOUBLE", length=None):
+        self.add_fields([name], field_type, length)
+
+    def add_fields(self, names, field_type="DOUBLE", length=None):
+        """Add REAL (DOUBLE) or TEXT columns in one transaction."""
+        column_type = ' TEXT' if field_type == "TEXT" else ' REAL'
+        with self.connection:
+            for name in names:
+                self.connection.execute('ALTER TABLE ' + self._quote(self.name) +
+                                        ' ADD COLUMN ' + self._quote(name) + column_type)
+
+    def _where(self, key_range):
+        if key_range is None:
+            return '', ()
+        return ' WHERE rowid >= ? AND rowid < ?', tuple(key_range)
+
+    def key_bounds(self):
+        """Return the lowest and highest rowid, or None for an empty table."""
+        low, high = self.connection.execute(
+            'SELECT min(rowid), max(rowid) FROM ' + self._quote(self.name)).fetchone()
+        if low is None:
+            return None
+        return low, high
+
+    def count_rows(self):
+        return self.connection.execute(
+            'SELECT count(*) FROM ' + self._quote(self.name)).fetchone()[0]
+
+    def geometry_field(self):
+        """Return the geometry column registered for the table in gpkg_geometry_columns."""
+        try:
+            row = self.connection.execute(
+                'SELECT column_name FROM gpkg_geometry_columns WHERE lower(table_name) = ?',
+                (self.name.lower(),)).fetchone()
+        except sqlite3.OperationalError:
+            row = None
+        if row is None:
+            raise ValueError('no geometry column is registered for ' + self.table)
+        return row[0]
+
+    def _select(self, fields, key_range):
+        """Return the rows of rowid and fields, GEOMETRY_AREA read as geometry blobs."""
+        columns = [self.geometry_field() if f == GEOMETRY_AREA else f for f in fields]
+        where, params = self._where(key_range)
+        return self.connection.execute(
+            'SELECT rowid, ' + ', '.join(self._quote(f) for f in columns) + ' FROM ' +
+            self._quote(self.name) + where + ' ORDER BY rowid', params).fetchall()
+
+    def read_arrays(self, fields, key_range=None):
+        """Return the rowids and a dict of column arrays for fields.
+
+        Numeric columns are float arrays with NaN for null; text columns
+        are object arrays.  key_range limits the read to rowids in
+        [start, stop).
+        """
+        rows = self._select(fields, key_range)
+        columns = list(zip(*rows)) or [()] * (len(fields) + 1)
+        keys = np.array(columns[0], dtype=np.int64)
+        arrays = {}
+        for field, column in zip(fields, columns[1:]):
+            if field == GEOMETRY_AREA:
+                from vri_geometry import polygon_areas
+                arrays[field] = polygon_areas(column)
+            else:
+                arrays[field] = _column_array(column)
+        return keys, arrays
+
+    def read_rows(self, fields, key_range=None):
+        """Return a list of (rowid, values) for the rows in key_range."""
+        rows = self._select(fields, key_range)
+        if GEOMETRY_AREA in fields and rows:
+            from vri_geometry import polygon_areas
+            position = fields.index(GEOMETRY_AREA) + 1
+            areas = nan_to_none(polygon_areas([row[position] for row in rows]))
+            rows = [row[:position] + (area,) + row[position + 1:]
+                    for row, area in zip(rows, areas)]
+        return [(row[0], row[1:]) for row in rows]
+
+    def write_rows(self, keys, fields, rows, key_range=None):
+        """Write rows of values to fields by rowid.
+
+        rows are value lists or a float array (NaN for null), converted
+        batch by batch.  All batches are committed as one transaction.
+        """
+        update = 'UPDATE ' + self._quote(self.name) + ' SET ' + \
+                 ', '.join(self._quote(f) + ' = ?' for f in fields) + ' WHERE rowid = ?'
+        with self.connection:
+            for start in range(0, len(keys), self.batch_size):
+                stop = start + self.batch_size
+                self.connection.executemany(
+                    update, _update_params(keys[start:stop], rows[start:stop]))
+        return len(keys)
+
+    def update(self, read_fields, write_fields, compute, key_range=None, progress=None):
+        """Write compute(read values) to write_fields for every row.
+
+        Rows are read in rowid order batch_size at a time and written back
+        with executemany; all batches are committed as one transaction.
+        key_range limits the update to rowids in [start, stop).
+        progress, if given, is called with the number of rows updated so
+        far after each batch.
+        """
+        start, stop = key_range or (MIN_ROWID, None)
+        select = 'SELECT rowid, ' + ', '.join(self._quote(f) for f in read_fields) + \
+                 ' FROM ' + self._quote(self.name) + ' WHERE rowid >= ?' + \
+                 ('' if stop is None else ' AND rowid < %d' % stop) + ' ORDER BY rowid LIMIT ?'
+        update = 'UPDATE ' + self._quote(self.name) + ' SET ' + \
+                 ', '.join(self._quote(f) + ' = ?' for f in write_fields) + ' WHERE rowid = ?'
+        count = 0
+        with self.connection:
+            while True:
+                rows = self.connection.execute(select, (start, self.batch_size)).fetchall()
+                if not rows:
+                    break
+                params = [list(compute(row[1:])) + [row[0]] for row in rows]
+                self.connection.executemany(update, params)
+                start = rows[-1][0] + 1
+                count += len(rows)
+                if progress is not None:
+                    progress(count)
+        return count
+
+    def close(self):
+        self.connection.close()
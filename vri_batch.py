@@ -0,0 +1,224 @@
+"""
+Copyright 2011-16 Province of British Columbia
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+# -------------------------------------------------------------------------
+# Tool Name: VRI volume batch runner
+# Source Name: vri_batch.py
+# Version: ArcGIS 10.3.1, Python 2.7.8
+# Author:  British Columbia Ministry of Forests and Range
+#          Coast Forest Region Geomatic Services
+#
+# Required Arguments: manifest (text file, one VRI table per line; blank
+#                     lines and lines starting with # are ignored)
+# Optional Arguments: --tool vph|totals|volumes (default volumes)
+#                     --jobs N              datasets processed at once
+#                     --status FILE         JSON status of every dataset
+#                     any AddVolumesToVRI / AddVphFieldsToVRI /
+#                     AddTotVolFieldsToVRI option, applied to every
+#                     dataset; {name} in an option value is replaced by
+#                     the dataset name (e.g. --report reports/{name}.json)
+#
+# Description: Runs a volume tool over many VRI extracts (one per TSA or
+#              map sheet tile) in a pool of --jobs worker processes, so
+#              arcpy is imported once per worker rather than once per
+#              dataset; with --jobs 1, the default, datasets run one at
+#              a time in this process and may use --workers.  Datasets
+#              are scheduled largest first so the pool finishes evenly.
+#              A failed dataset is reported and the batch carries on;
+#              the status of each dataset (ok or failed, rows, seconds,
+#              error) is printed as it finishes and written to --status.
+# Created: October 17, 2026
+# ------------------------------------------------------------------------
+"""
+
+import argparse
+import json
+import multiprocessing
+import posixpath
+import sys
+import time
+import traceback
+
+from vri_backends import add_message, open_backend
+from vri_parallel import _set_executable
+from vri_volumes import build_parser, run_tool, totals_job, volumes_job, vph_job
+
+# tool name and parser description of each --tool
+TOOLS = {
+    'vph': ('AddVphFieldsToVRI',
+            'Add fields for tabulating volume per hectare by species to a VRI table'),
+    'totals': ('AddTotVolFieldsToVRI',
+               'Add fields for tabulating volume (m3) by species group to a VRI table'),
+    'volumes': ('AddVolumesToVRI',
+                'Add volume per hectare and total volume fields to a VRI table'),
+}
+
+
+def tool_parser(tool):
+    """Return the command line parser of a volume tool."""
+    parser = build_parser(TOOLS[tool][1], summary=tool != 'vph', species=tool != 'totals')
+    if tool == 'volumes':
+        parser.add_argument('--skip-vph', action='store_true',
+                            help='do not write the species vph fields, only the group totals')
+    return parser
+
+
+def tool_job(tool, args):
+    """Return the volume job of a tool for its parsed arguments."""
+    if tool == 'vph':
+        return vph_job(args.levels, args.species_rules)
+    if tool == 'totals':
+        return totals_job(args.levels)
+    return volumes_job(not args.skip_vph, args.levels, args.species_rules)
+
+
+def read_manifest(path):
+    """Return the tables listed in a manifest file."""
+    tables = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                tables.append(line)
+    return tables
+
+
+def dataset_name(table):
+    """Return a short name for a table: its file or geodatabase name and table name.
+
+    'tiles/092B.gpkg|veg_comp' is 092B_veg_comp and
+    'tiles/092B.gdb/VEG_COMP' is 092B_VEG_COMP.
+    """
+    path = table.replace('\\', '/').rstrip('/')
+    if '|' in path:
+        container, name = path.split('|', 1)
+    else:
+        container, name = posixpath.split(path)
+    stem = posixpath.splitext(posixpath.basename(container))[0]
+    return stem + '_' + name if stem else name
+
+
+def dataset_size(table):
+    """Return the row count of a table, or None if it cannot be opened."""
+    try:
+        backend = open_backend(table, read_only=True)
+        try:
+            return backend.count_rows()
+        finally:
+            backend.close()
+    except Exception:
+        return None
+
+
+def run_dataset(task):
+    """Run the tool on one dataset in a worker; return its status record."""
+    tool, table, tool_args = task
+    name = dataset_name(table)
+    record = {'input': table, 'name': name}
+    start = time.time()
+    try:
+        args = tool_parser(tool).parse_args([table] +
+                                            [arg.replace('{name}', name) for arg in tool_args])
+        record['rows'] = run_tool(TOOLS[tool][0], args, tool_job(tool, args))
+        record['status'] = 'ok'
+    except (Exception, SystemExit) as e:
+        record['status'] = 'failed'
+        record['error'] = '%s: %s' % (e.__class__.__name__, e)
+        record['traceback'] = traceback.format_exc()
+    record['seconds'] = time.time() - start
+    return record
+
+
+def write_status(path, records):
+    with open(path, 'w') as f:
+        json.dump(records, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def run_batch(tool, tables, tool_args, jobs=1, status=None):
+    """Run a tool over tables in a pool of jobs processes, largest first.
+
+    With jobs 1 the tables are run in this process, so the tool may
+    start its own --workers processes.  Returns a status record per
+    table, in the order they finished.  Tables that cannot be sized are
+    scheduled last and fail when run.
+    """
+    sizes = dict((table, dataset_size(table)) for table in tables)
+    order = sorted(tables, key=lambda table: -1 if sizes[table] is None else sizes[table],
+                   reverse=True)
+    tasks = [(tool, table, tool_args) for table in order]
+    records = []
+
+    def finished(record):
+        record['size'] = sizes[record['input']]
+        records.append(record)
+        add_message('[%d/%d] %-6s %s  %s rows, %.1f s%s' % (
+            len(records), len(tasks), record['status'], record['input'], record.get('rows', '-'),
+            record['seconds'], '  ' + record['error'] if 'error' in record else ''))
+        if status:
+            write_status(status, records)
+
+    if jobs == 1:
+        for task in tasks:
+            finished(run_dataset(task))
+        return records
+    _set_executable()
+    pool = multiprocessing.Pool(jobs)
+    try:
+        for record in pool.imap_unordered(run_dataset, tasks):
+            finished(record)
+        pool.close()
+    except Exception:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Run a VRI volume tool over the tables listed in a manifest',
+        epilog='Other options are passed to the tool for every dataset; {name} in an '
+               'option value is replaced by the dataset name.')
+    parser.add_argument('manifest', help='text file listing one VRI table per line')
+    parser.add_argument('--tool', choices=sorted(TOOLS), default='volumes',
+                        help='volume tool to run (default: volumes)')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='datasets processed at once (default: 1)')
+    parser.add_argument('--status', help='write the JSON status of every dataset to this file')
+    args, tool_args = parser.parse_known_args()
+
+    # check the tool options once, before any dataset is run
+    checked = tool_parser(args.tool).parse_args(['input'] + tool_args)
+    if args.jobs > 1 and checked.workers > 1:
+        parser.error('--workers cannot be used with --jobs greater than 1')
+    tables = read_manifest(args.manifest)
+    if not tables:
+        parser.error('no tables listed in ' + args.manifest)
+
+    start = time.time()
+    records = run_batch(args.tool, tables, tool_args, args.jobs, args.status)
+    failed = [record for record in records if record['status'] != 'ok']
+    add_message('%d datasets, %d ok, %d failed, %.1f s' % (
+        len(records), len(records) - len(failed), len(failed), time.time() - start))
+    for record in failed:
+        add_message('    failed: ' + record['input'] + '  ' + record['error'])
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,366 @@
+"""
+Copyright 2011-16 Province of British Columbia
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+# -------------------------------------------------------------------------
+# Tool Name: VRI volume benchmark
+# Source Name: vri_benchmark.py
+# Version: ArcGIS 10.3.1, Python 2.7.8
+# Author:  British Columbia Ministry of Forests and Range
+#          Coast Forest Region Geomatic Services
+#
+# Optional Arguments: --rows N [N ...]      table sizes (default 10000)
+#                     --tools volumes vph+totals vph totals
+#                                           tool runs to compare (default
+#                                           volumes vph+totals)
+#                     --engines row numpy   engines to compare
+#                     --modes serial chunked workers pipeline
+#                                           run modes to compare
+#                     --chunk-size N        OBJECTID range size of the
+#                                           chunked, workers and pipeline
+#                                           modes (default 10000)
+#                     --workers N           processes of the workers mode
+#                                           (default 2)
+#                     --backends sqlite gdb backends to compare
+#                     --workdir DIR         where test tables are written
+#                     --output FILE         JSON results (default stdout)
+#                     --seed N              generator seed
+#
+# Description: Generates synthetic VRI tables with VEG_COMP(2009) species
+#              and volume fields and runs the tools' jobs on them through
+#              vri_volumes.run_job, the code path of the tools, for every
+#              tool run, engine, run mode and backend.  The tool runs are
+#                volumes    - AddVolumesToVRI, vph and totals in one scan
+#                vph+totals - AddVphFieldsToVRI then AddTotVolFieldsToVRI
+#                vph        - AddVphFieldsToVRI alone
+#                totals     - AddTotVolFieldsToVRI alone, on a table whose
+#                             vph fields are populated first (untimed)
+#              Each case reports, for each tool job, the schema time
+#              (adding the output fields) and the parts timed by the
+#              run's StageTimer: update (the row engine's interleaved
+#              update cursor) or read, compute and write, plus the stall
+#              times of the pipeline.  Each case runs in its own process
+#              so peak RSS is per case.  Results are written as JSON, one
+#              record per case, for tracking across releases.
+# Created: October 17, 2026
+# ------------------------------------------------------------------------
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import time
+import traceback
+
+from vri_backends import arcpy, open_backend
+from vri_instrument import StageTimer
+from vri_parallel import _set_executable
+from vri_species import AREA_FIELD, LIVE_VOL_FIELDS, SPECIES_CD_FIELDS, SPECIES_SLOTS
+from vri_volumes import ENGINES, RunOptions, run_job, totals_job, volumes_job, vph_job
+
+BACKENDS = ('sqlite', 'gdb')
+MODES = ('serial', 'chunked', 'workers', 'pipeline')
+# tool runs: the jobs run one after the other on the same table
+TOOLS = ('volumes', 'vph+totals', 'vph', 'totals')
+JOBS = {'volumes': volumes_job, 'vph': vph_job, 'totals': totals_job}
+TABLE = 'veg_comp'
+
+# leading species mixes and their relative weights
+COASTAL_SPECIES = [('HW', 30), ('CW', 20), ('FD', 18), ('BA', 8), ('SS', 4), ('YC', 5),
+                   ('DR', 6), ('HM', 4), ('PL', 2), ('MB', 1), ('ACT', 1), ('EP', 1)]
+INTERIOR_SPECIES = [('PLI', 30), ('SX', 18), ('BL', 15), ('SW', 6), ('SE', 5), ('FDI', 8),
+                    ('AT', 7), ('EP', 3), ('ACT', 2), ('LW', 2), ('PY', 1), ('PA', 1),
+                    ('HW', 1), ('CW', 1)]
+# codes that match no rule and end up in Unknown
+UNKNOWN_CODES = ['X', 'Z', 'PJ', 'JR', 'QG', 'TW', 'XC']
+COASTAL_SHARE = 0.4
+NON_FOREST_SHARE = 0.15
+NULL_VOLUME_SHARE = 0.02
+UNKNOWN_CODE_SHARE = 0.01
+SPECIES_COUNT_WEIGHTS = [20, 25, 22, 15, 10, 8]
+
+
+def _weighted_choice(rng, choices):
+    total = sum(weight for value, weight in choices)
+    pick = rng.uniform(0, total)
+    for value, weight in choices:
+        pick -= weight
+        if pick <= 0:
+            return value
+    return choices[-1][0]
+
+
+def generate_rows(count, seed=0):
+    """Yield synthetic VRI rows: six species codes, six volumes and area.
+
+    Coastal stands draw from Hw/Cw/Fd mixes and interior stands from
+    Pl/Sx/Bl mixes.  Non-forest polygons have no species and null
+    volumes; unused slots are blank ('' or null); a few codes are
+    unknown and a few species volumes are null.
+    """
+    rng = random.Random(seed)
+    slots = list(range(1, SPECIES_SLOTS + 1))
+    for i in range(count):
+        area = rng.lognormvariate(11, 1.2)
+        if rng.random() < NON_FOREST_SHARE:
+            yield [None] * (2 * SPECIES_SLOTS) + [area]
+            continue
+        mix = COASTAL_SPECIES if rng.random() < COASTAL_SHARE else INTERIOR_SPECIES
+        n = _weighted_choice(rng, list(zip(slots, SPECIES_COUNT_WEIGHTS)))
+        codes = []
+        while len(codes) < n:
+            code = _weighted_choice(rng, mix)
+            if rng.random() < UNKNOWN_CODE_SHARE:
+                code = rng.choice(UNKNOWN_CODES)
+            if code not in codes:
+                codes.append(code)
+        shares = sorted((rng.random() for code in codes), reverse=True)
+        total = sum(shares)
+        stand = rng.gammavariate(2, 150)
+        vols = [None if rng.random() < NULL_VOLUME_SHARE else stand * share / total
+                for share in shares]
+        blank = rng.choice(['', None])
+        yield (codes + [blank] * (SPECIES_SLOTS - n) + vols + [None] * (SPECIES_SLOTS - n) +
+               [area])
+
+
+def input_fields():
+    return SPECIES_CD_FIELDS + LIVE_VOL_FIELDS + [AREA_FIELD]
+
+
+def write_sqlite_table(path, count, seed=0):
+    """Write a synthetic VRI table to a SQLite file; return 'path|table'."""
+    if os.path.exists(path):
+        os.remove(path)
+    connection = sqlite3.connect(path)
+    columns = ['"%s" TEXT' % field for field in SPECIES_CD_FIELDS] + \
+              ['"%s" REAL' % field for field in LIVE_VOL_FIELDS + [AREA_FIELD]]
+    connection.execute('CREATE TABLE %s (fid INTEGER PRIMARY KEY, %s)' %
+                       (TABLE, ', '.join(columns)))
+    insert = 'INSERT INTO %s (%s) VALUES (%s)' % (
+        TABLE, ', '.join('"%s"' % field for field in input_fields()),
+        ', '.join('?' * len(input_fields())))
+    batch = []
+    with connection:
+        for row in generate_rows(count, seed):
+            batch.append(row)
+            if len(batch) == 10000:
+                connection.executemany(insert, batch)
+                batch = []
+        connection.executemany(insert, batch)
+    connection.close()
+    return path + '|' + TABLE
+
+
+def write_gdb_table(gdb, count, seed=0):
+    """Write a synthetic VRI table to a file geodatabase; return its path."""
+    if arcpy.Exists(gdb):
+        arcpy.Delete_management(gdb)
+    arcpy.CreateFileGDB_management(os.path.dirname(gdb), os.path.basename(gdb))
+    arcpy.CreateTable_management(gdb, TABLE)
+    table = os.path.join(gdb, TABLE)
+    for field in SPECIES_CD_FIELDS:
+        arcpy.AddField_management(table, field, "TEXT", "", "", 3)
+    for field in LIVE_VOL_FIELDS + [AREA_FIELD]:
+        arcpy.AddField_management(table, field, "DOUBLE")
+    with arcpy.da.InsertCursor(table, input_fields()) as ic:
+        for row in generate_rows(count, seed):
+            ic.insertRow(row)
+    return table
+
+
+def peak_rss_kb():
+    """Return the peak resident set size of this process in KB, or None."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak //= 1024
+    return peak
+
+
+def case_options(case):
+    """Return the RunOptions of a case's engine and mode."""
+    mode = case['mode']
+    return RunOptions(engine=case['engine'],
+                      chunk_size=case['chunk_size'] if mode != 'serial' else None,
+                      workers=case['workers'] if mode == 'workers' else 1,
+                      pipeline=(2, 2) if mode == 'pipeline' else None)
+
+
+def run_tool_job(backend, job, options):
+    """Add a job's output fields and run it; return its stages, run time and rows."""
+    start = time.time()
+    existing = set(field.lower() for field in backend.list_fields())
+    backend.add_fields([field for field in job.write_fields if field.lower() not in existing])
+    schema = time.time() - start
+    timer = StageTimer(job.name)
+    count, skipped = run_job(backend, job, options, timer)
+    timer.stop()
+    stages = dict(timer.parts)
+    stages['schema'] = schema
+    return stages, timer.seconds, count
+
+
+def run_case(case):
+    """Run the jobs of one case's tool run on a copy of the table and time them.
+
+    Stages are reported by job, for example stages['vph']['compute'].
+    """
+    # tool messages go to stderr, leaving stdout to the JSON results
+    sys.stdout = sys.stderr
+    names = case['tool'].split('+')
+    backend = open_backend(case['table'])
+    try:
+        if names == ['totals']:
+            # the totals job reads the vph fields, so populate them first
+            run_tool_job(backend, vph_job(), RunOptions())
+        stages = {}
+        seconds = 0.0
+        for name in names:
+            stages[name], job_seconds, count = run_tool_job(backend, JOBS[name](),
+                                                            case_options(case))
+            seconds += job_seconds
+    finally:
+        backend.close()
+
+    schema = sum(job_stages['schema'] for job_stages in stages.values())
+    result = dict(case)
+    result.update({'stages': stages, 'seconds': schema + seconds, 'rows_updated': count,
+                   'rows_per_sec': count / seconds if seconds else None,
+                   'peak_rss_kb': peak_rss_kb()})
+    return result
+
+
+def _case_process(case, results):
+    try:
+        results.put(run_case(case))
+    except Exception:
+        results.put(dict(case, error=traceback.format_exc()))
+
+
+def run_case_process(case):
+    """Run a case in a fresh process and return its result.
+
+    A plain process rather than a pool worker, so the workers mode can
+    start its own pool.
+    """
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_case_process, args=(case, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def _copy_table(table, backend, workdir, label):
+    if backend == 'sqlite':
+        path, name = table.split('|')
+        copy = os.path.join(workdir, label + '.sqlite')
+        shutil.copy(path, copy)
+        return copy + '|' + name
+    copy = os.path.join(workdir, label + '.gdb')
+    if arcpy.Exists(copy):
+        arcpy.Delete_management(copy)
+    arcpy.Copy_management(os.path.dirname(table), copy)
+    return os.path.join(copy, TABLE)
+
+
+def run_benchmark(sizes, engines, backends, workdir, seed=0, modes=('serial',),
+                  chunk_size=10000, workers=2, tools=('volumes',)):
+    """Return the results of every size / backend / tool / engine / mode case."""
+    if not os.path.isdir(workdir):
+        os.makedirs(workdir)
+    _set_executable()
+    results = []
+    for size in sizes:
+        for backend in backends:
+            if backend == 'sqlite':
+                source = write_sqlite_table(os.path.join(workdir, 'vri_%d.sqlite' % size),
+                                            size, seed)
+            else:
+                source = write_gdb_table(os.path.join(workdir, 'vri_%d.gdb' % size), size, seed)
+            for tool in tools:
+                for engine in engines:
+                    for mode in modes:
+                        label = 'vri_%d_%s_%s_%s_%s' % (size, backend, tool.replace('+', '_'),
+                                                        engine, mode)
+                        case = {'rows': size, 'backend': backend, 'tool': tool,
+                                'engine': engine, 'mode': mode, 'chunk_size': chunk_size,
+                                'workers': workers,
+                                'table': _copy_table(source, backend, workdir, label)}
+                        # a fresh process per case keeps peak RSS separate
+                        results.append(run_case_process(case))
+    return results
+
+
+def environment():
+    """Return the interpreter and library versions the results belong to."""
+    info = {'python': platform.python_version(), 'platform': platform.platform()}
+    try:
+        import numpy
+        info['numpy'] = numpy.__version__
+    except ImportError:
+        info['numpy'] = None
+    if arcpy is not None:
+        info['arcgis'] = arcpy.GetInstallInfo()['Version']
+    return info
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the VRI volume computation')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000],
+                        help='synthetic table sizes (default: 10000)')
+    parser.add_argument('--tools', nargs='+', choices=TOOLS, default=['volumes', 'vph+totals'],
+                        help='tool runs to compare (default: volumes vph+totals)')
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=list(ENGINES))
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES),
+                        help='run modes to compare (default: all)')
+    parser.add_argument('--chunk-size', type=int, default=10000,
+                        help='OBJECTID range size of the chunked, workers and pipeline modes '
+                             '(default: 10000)')
+    parser.add_argument('--workers', type=int, default=2,
+                        help='processes of the workers mode (default: 2)')
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS,
+                        default=['sqlite', 'gdb'] if arcpy is not None else ['sqlite'])
+    parser.add_argument('--workdir', default='vri_benchmark',
+                        help='directory for the synthetic tables (default: vri_benchmark)')
+    parser.add_argument('--output', help='write JSON results to this file (default: stdout)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    if 'gdb' in args.backends and arcpy is None:
+        parser.error('the gdb backend requires arcpy')
+
+    report = {'environment': environment(),
+              'results': run_benchmark(args.rows, args.engines, args.backends, args.workdir,
+                                       args.seed, args.modes, args.chunk_size, args.workers,
+                                       args.tools)}
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Copyright 2011-16 Province of British Columbia
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+# -------------------------------------------------------------------------
+# Source Name: vri_checkpoint.py
+# Version: ArcGIS 10.3.1, Python 2.7.8
+# Author:  British Columbia Ministry of Forests and Range
+#          Coast Forest Region Geomatic Services
+#
+# Description: Resumable runs.  Each OBJECTID range is committed to the
+#              table as it is written; the checkpoint file records the
+#              ranges completed so far and the run parameters, and is
+#              replaced atomically after every range.  A run restarted
+#              with the same checkpoint skips the completed ranges.  The
+#              file is removed when the run completes.
+# ------------------------------------------------------------------------
+"""
+
+import json
+import os
+
+
+def _replace(source, target):
+    """Rename source over target, replacing it atomically (os.replace on Python 3)."""
+    if hasattr(os, 'replace'):
+        os.replace(source, target)
+    elif os.name == 'nt':
+        # Python 2 os.rename cannot replace an existing file on Windows
+        import ctypes
+        MOVEFILE_REPLACE_EXISTING, MOVEFILE_WRITE_THROUGH = 0x1, 0x8
+        if not ctypes.windll.kernel32.MoveFileExW(u'%s' % source, u'%s' % target,
+                                                  MOVEFILE_REPLACE_EXISTING |
+                                                  MOVEFILE_WRITE_THROUGH):
+            raise ctypes.WinError()
+    else:
+        os.rename(source, target)
+
+
+class Checkpoint(object):
+    """Completed OBJECTID ranges of a run, kept in a JSON file.
+
+    params identify the run (tool, input table, output fields, species
+    rules); resuming from a checkpoint written with other params raises
+    ValueError.
+    """
+
+    def __init__(self, path, params):
+        self.path = path
+        self.params = params
+        self.done = []
+        if os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            if saved['params'] != params:
+                raise ValueError('checkpoint %s was written by a different run (%s); '
+                                 'delete it to start over' % (path, saved['params']))
+            self.done = [tuple(key_range) for key_range in saved['done']]
+
+    def is_done(self, key_range):
+        """Return True if key_range lies within a completed range."""
+        start, stop = key_range
+        return any(low <= start and stop <= high for low, high in self.done)
+
+    def pending(self, ranges):
+        """Return the ranges not yet completed."""
+        return [key_range for key_range in ranges if not self.is_done(key_range)]
+
+    def mark_done(self, key_range):
+        """Record key_range as completed, merging adjacent ranges, and save."""
+        merged = []
+        for low, high in sorted(self.done + [tuple(key_range)]):
+            if merged and low <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], high))
+            else:
+                merged.append((low, high))
+        self.done = merged
+        self._save()
+
+    def _save(self):
+        temp = self.path + '.tmp'
+        with open(temp, 'w') as f:
+            json.dump({'params': self.params, 'done': self.done}, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        _replace(temp, self.path)
+
+    def remove(self):
+        """Remove the checkpoint file of a completed run."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
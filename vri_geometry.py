@@ -0,0 +1,134 @@
+"""
+Copyright 2011-16 Province of British Columbia
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+# -------------------------------------------------------------------------
+# Source Name: vri_geometry.py
+# Version: ArcGIS 10.3.1, Python 2.7.8
+# Author:  British Columbia Ministry of Forests and Range
+#          Coast Forest Region Geomatic Services
+#
+# Description: Polygon area from geometry, for VRI tables whose
+#              GEOMETRY_Area field is missing or stale (after overlays,
+#              GeoPackage exports or shapefile conversions).  GeoPackage
+#              geometry blobs and WKB (ISO and EWKB Z/M variants, either
+#              byte order) are parsed for the offsets of their polygon
+#              rings only; the ring coordinates of a whole chunk are then
+#              read into one array and the planar ring areas computed with
+#              vectorized shoelace sums.  Holes are subtracted and the
+#              parts of multipart polygons added.  Areas are in the units
+#              of the coordinate system squared (square metres for BC
+#              Albers).
+# ------------------------------------------------------------------------
+"""
+
+import struct
+
+import numpy as np
+
+# WKB geometry types
+POINT, LINESTRING, POLYGON = 1, 2, 3
+COLLECTIONS = (4, 5, 6, 7)  # multipoint, multilinestring, multipolygon, collection
+
+# EWKB type flags
+EWKB_Z, EWKB_M, EWKB_SRID = 0x80000000, 0x40000000, 0x20000000
+
+# bytes of the GeoPackage blob header envelope by envelope indicator
+ENVELOPE_BYTES = (0, 32, 48, 48, 64)
+
+
+def wkb_offset(blob):
+    """Return the offset of the WKB in a GeoPackage geometry blob (0 for plain WKB)."""
+    if blob[:2] != b'GP':
+        return 0
+    flags = struct.unpack_from('B', blob, 3)[0]
+    return 8 + ENVELOPE_BYTES[(flags >> 1) & 7]
+
+
+def polygon_rings(blob, offset, rings):
+    """Append the rings of the WKB geometry at offset to rings.
+
+    Each ring is (offset of its coordinates, points, dimensions, byte
+    order, outer) where outer is False for holes.  Points and lines of a
+    geometry collection are skipped.  Returns the offset after the
+    geometry.
+    """
+    order = '<' if blob[offset:offset + 1] == b'\x01' else '>'
+    code = struct.unpack_from(order + 'I', blob, offset + 1)[0]
+    offset += 5
+    dims = 2 + bool(code & EWKB_Z) + bool(code & EWKB_M)
+    if code & EWKB_SRID:
+        offset += 4
+    code &= 0x0fffffff
+    dims += (0, 1, 1, 2)[code // 1000]  # ISO Z, M and ZM types
+    code %= 1000
+    if code == POINT:
+        return offset + 8 * dims
+    count = struct.unpack_from(order + 'I', blob, offset)[0]
+    offset += 4
+    if code == LINESTRING:
+        return offset + 8 * dims * count
+    if code == POLYGON:
+        for ring in range(count):
+            points = struct.unpack_from(order + 'I', blob, offset)[0]
+            rings.append((offset + 4, points, dims, order, ring == 0))
+            offset += 4 + 8 * dims * points
+        return offset
+    if code in COLLECTIONS:
+        for part in range(count):
+            offset = polygon_rings(blob, offset, rings)
+        return offset
+    raise ValueError('unsupported WKB geometry type %d' % code)
+
+
+def polygon_areas(blobs):
+    """Return the planar area of each geometry blob as a float array.
+
+    blobs are GeoPackage geometry blobs or WKB; null blobs have a NaN
+    area and geometries without polygons an area of 0.
+    """
+    areas = np.empty(len(blobs))
+    areas.fill(np.nan)
+    coords = []
+    owners = []
+    signs = []
+    for i, blob in enumerate(blobs):
+        if blob is None:
+            continue
+        blob = bytes(blob)
+        rings = []
+        polygon_rings(blob, wkb_offset(blob), rings)
+        areas[i] = 0.0
+        for offset, points, dims, order, outer in rings:
+            if points < 3:
+                continue
+            xy = np.frombuffer(blob, order + 'f8', points * dims, offset)
+            coords.append(xy.reshape(points, dims)[:, :2])
+            owners.append(i)
+            signs.append(1.0 if outer else -1.0)
+    if not coords:
+        return areas
+    counts = np.array([len(ring) for ring in coords])
+    starts = np.cumsum(counts) - counts
+    xy = np.concatenate(coords).astype(float)
+    # measure each ring from its first vertex: keeps the precision of
+    # large projected coordinates and makes the closing edge add nothing,
+    # so unclosed rings are measured as if closed
+    xy -= np.repeat(xy[starts], counts, axis=0)
+    x, y = xy[:, 0], xy[:, 1]
+    cross = np.zeros(len(xy))
+    cross[:-1] = x[:-1] * y[1:] - x[1:] * y[:-1]
+    cross[starts[1:] - 1] = 0.0  # edges from one ring to the next
+    ring_areas = np.abs(np.add.reduceat(cross, starts)) / 2.0
+    return areas + np.bincount(owners, np.array(signs) * ring_areas, minlength=len(blobs))
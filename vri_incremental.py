@@ -0,0 +1,107 @@
+"""
+Copyright 2011-16 Province of British Columbia
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+# -------------------------------------------------------------------------
+# Source Name: vri_incremental.py
+# Version: ArcGIS 10.3.1, Python 2.7.8
+# Author:  British Columbia Ministry of Forests and Range
+#          Coast Forest Region Geomatic Services
+#
+# Description: Input fingerprints for incremental recompute.  Each row
+#              stores a 16 character hash of the job inputs (species
+#              codes, species volumes, GEOMETRY_Area) in a fp_<job> text
+#              field.  On later runs only rows whose fingerprint changed,
+#              or that have none yet, are recomputed and written.
+#              Geoprocessing that copies the field to a new feature class
+#              but changes polygon areas still triggers a recompute.
+# ------------------------------------------------------------------------
+"""
+
+import hashlib
+import numbers
+
+FINGERPRINT_LENGTH = 16
+
+
+def fingerprint_field(job):
+    """Return the name of the field holding a job's input fingerprints."""
+    return 'fp_' + job.name
+
+
+def fingerprint(values, salt):
+    """Return the fingerprint of one row's input values.
+
+    Null, empty and NaN values hash alike so the fingerprint is the same
+    whichever engine or backend read the row.  salt identifies the job
+    outputs and species rules, so changing them forces a recompute.
+    """
+    parts = [salt]
+    for value in values:
+        if value is None or value == '' or (isinstance(value, float) and value != value):
+            parts.append('N')
+        elif isinstance(value, numbers.Number):
+            parts.append(repr(float(value)))
+        else:
+            parts.append(value)
+    digest = hashlib.sha1('\x1f'.join(parts).encode('utf-8')).hexdigest()
+    return digest[:FINGERPRINT_LENGTH]
+
+
+def job_salt(job):
+    """Return the output fields and any species rules of a job as a string.
+
+    It is mixed into every fingerprint, so a new --species-rules file
+    recomputes every row, and kept in checkpoints, so a run is not
+    resumed with other rules.
+    """
+    salt = ','.join(job.write_fields)
+    if job.species is not None:
+        salt += ';' + ','.join('%d=%s' % rule for rule in job.species.rules)
+    return salt
+
+
+def changed_rows(job, rows):
+    """Filter (key, values + stored fingerprint) rows to the changed ones.
+
+    Returns the keys, input values and new fingerprints of those rows.
+    """
+    salt = job_salt(job)
+    keys, values, fingerprints = [], [], []
+    for key, row in rows:
+        new = fingerprint(row[:-1], salt)
+        if new != row[-1]:
+            keys.append(key)
+            values.append(row[:-1])
+            fingerprints.append(new)
+    return keys, values, fingerprints
+
+
+def changed_arrays(job, keys, columns):
+    """Filter a key array and column arrays to the changed rows.
+
+    columns holds the job read fields and the stored fingerprints.
+    Returns the keys, column arrays and new fingerprints of those rows.
+    """
+    salt = job_salt(job)
+    stored = columns[fingerprint_field(job)]
+    inputs = zip(*[columns[field] for field in job.read_fields])
+    changed, fingerprints = [], []
+    for index, row in enumerate(inputs):
+        new = fingerprint(row, salt)
+        if new != stored[index]:
+            changed.append(index)
+            fingerprints.append(new)
+    return keys[changed], dict((field, columns[field][changed])
+                               for field in job.read_fields), fingerprints
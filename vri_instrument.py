@@ -0,0 +1,142 @@
+"""
+Copyright 2011-16 Province of British Columbia
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+# -------------------------------------------------------------------------
+# Source Name: vri_instrument.py
+# Version: ArcGIS 10.3.1, Python 2.7.8
+# Author:  British Columbia Ministry of Forests and Range
+#          Coast Forest Region Geomatic Services
+#
+# Description: Timing and throughput instrumentation for the VRI volume
+#              tools.  A RunReport records each stage of a run (wall
+#              time, rows, rows/sec and, where the stage reads and writes
+#              separately, read / compute / write time), reports progress
+#              with an ETA every N rows and is written as JSON at the
+#              end.  profiled() runs the hot loop under cProfile.
+# ------------------------------------------------------------------------
+"""
+
+import contextlib
+import json
+import time
+
+from vri_backends import add_message
+
+
+class StageTimer(object):
+    """Time and row counts of one stage of a run."""
+
+    def __init__(self, name, progress_every=None):
+        self.name = name
+        self.progress_every = progress_every
+        self.start = time.time()
+        self.seconds = 0.0
+        self.rows = 0
+        self.skipped = 0
+        self.parts = {}
+        self._reported = 0
+
+    @contextlib.contextmanager
+    def timed(self, part):
+        """Add the time spent in the block to part ('read', 'write', ...)."""
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add_time(part, time.time() - start)
+
+    def add_time(self, part, seconds):
+        self.parts[part] = self.parts.get(part, 0.0) + seconds
+
+    def add_rows(self, updated, skipped=0, fraction=None):
+        """Count rows processed; fraction is the share of the table done."""
+        self.rows += updated
+        self.skipped += skipped
+        self.report_progress(self.rows + self.skipped, fraction)
+
+    def report_progress(self, done, fraction=None):
+        """Report progress if progress_every more rows are done since the last report."""
+        if not self.progress_every or done - self._reported < self.progress_every:
+            return
+        self._reported = done
+        elapsed = time.time() - self.start
+        message = '    %d rows processed, %.0f rows/sec' % (done, done / elapsed if elapsed else 0)
+        if fraction:
+            message += ', ETA %.0f s' % (elapsed * (1 - fraction) / fraction)
+        add_message(message)
+
+    def stop(self):
+        self.seconds = time.time() - self.start
+
+    def as_dict(self):
+        done = self.rows + self.skipped
+        record = {'stage': self.name, 'seconds': self.seconds, 'rows': self.rows,
+                  'rows_per_sec': done / self.seconds if done and self.seconds else None}
+        if self.skipped:
+            record['skipped'] = self.skipped
+        for part, seconds in self.parts.items():
+            record[part + '_seconds'] = seconds
+        return record
+
+
+class RunReport(object):
+    """Stage timings of one tool run, written as a JSON report."""
+
+    def __init__(self, tool, table, options=None, progress_every=None):
+        self.tool = tool
+        self.table = table
+        self.options = options or {}
+        self.progress_every = progress_every
+        self.started = time.time()
+        self.stages = []
+        self.results = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Record the block as a stage; yields its StageTimer."""
+        timer = StageTimer(name, self.progress_every)
+        self.stages.append(timer)
+        try:
+            yield timer
+        finally:
+            timer.stop()
+
+    def as_dict(self):
+        return {'tool': self.tool, 'input': self.table, 'options': self.options,
+                'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+                'seconds': time.time() - self.started,
+                'stages': [timer.as_dict() for timer in self.stages],
+                'results': self.results}
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.as_dict(), f, indent=2, sort_keys=True)
+            f.write('\n')
+
+
+def profiled(path, function, *args, **kwargs):
+    """Call function, under cProfile with stats saved to path if given.
+
+    Work done in worker processes is not included in the profile.
+    """
+    if not path:
+        return function(*args, **kwargs)
+    import cProfile
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(function, *args, **kwargs)
+    finally:
+        profile.dump_stats(path)
+        add_message('    profile written to ' + path)
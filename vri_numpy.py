@@ -0,0 +1,169 @@
+"""
+Copyright 2011-16 Province of British Columbia
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+# -------------------------------------------------------------------------
+# Source Name: vri_numpy.py
+# Version: ArcGIS 10.3.1, Python 2.7.8
+# Author:  British Columbia Ministry of Forests and Range
+#          Coast Forest Region Geomatic Services
+#
+# Description: NumPy vectorized volume engine.  Works on whole columns
+#              loaded as arrays (see TableToNumPyArray) instead of row by
+#              row:
+#                - SPECIES_CD_1..6 are encoded as small integer rule codes
+#                - the vph matrix is built with a one-hot scatter-add
+#                - species group totals are one matrix multiply against
+#                  a group membership matrix
+#              Null volumes are carried as NaN.
+# ------------------------------------------------------------------------
+"""
+
+import numpy as np
+
+from vri_species import SPECIES, SPECIES_GROUPS, SPECIES_SLOTS, TOTAL_ORDER, SpeciesLookup
+
+NUM_SPECIES = len(SPECIES)
+
+# rule code given to species codes that match no rule
+UNMATCHED = NUM_SPECIES
+
+
+def stack_columns(columns, fields):
+    """Return an (n, len(fields)) array from a dict of column arrays."""
+    return np.column_stack([columns[field] for field in fields])
+
+
+def encode_species(codes, lookup=None):
+    """Return the rule code of each species code in an (n, 6) object array.
+
+    Each distinct code is classified once by lookup, a
+    vri_species.SpeciesLookup (default rules if None), with its number of
+    occurrences; codes that match no rule get UNMATCHED.
+    """
+    lookup = lookup or SpeciesLookup()
+    # null codes are None or, in a column read as all null, NaN
+    null = codes != codes
+    if codes.dtype == object:
+        null |= np.equal(codes, None)
+    if null.any():
+        # a copy that can hold '' also when a chunk's codes are all null
+        codes = codes.astype(object)
+        codes[null] = ''
+    # factorized with a dict of the distinct codes rather than np.unique,
+    # which would first convert every code to a fixed width string and sort
+    flat = codes.ravel().tolist()
+    distinct = dict((code, i) for i, code in enumerate(dict.fromkeys(flat)))
+    inverse = np.fromiter(map(distinct.__getitem__, flat), dtype=np.intp, count=len(flat))
+    counts = np.bincount(inverse, minlength=len(distinct))
+    table = np.empty(len(distinct), dtype=np.int8)
+    for code, i in distinct.items():
+        index = lookup.classify(code, int(counts[i]))
+        table[i] = UNMATCHED if index is None else index
+    return table[inverse].reshape(codes.shape)
+
+
+def membership_matrix():
+    """Return the (26, 14) species to group membership matrix.
+
+    Columns are the SPECIES_GROUPS in order, followed by the total of all
+    named species.
+    """
+    matrix = np.zeros((NUM_SPECIES, len(SPECIES_GROUPS) + 1))
+    for column, (group, members) in enumerate(SPECIES_GROUPS):
+        for species in members:
+            matrix[SPECIES.index(species), column] = 1
+    for species in TOTAL_ORDER:
+        matrix[SPECIES.index(species), -1] = 1
+    return matrix
+
+
+def winning_slots(codes, lookup=None):
+    """Return the rule codes of (n, 6) species codes and the slots that set a species.
+
+    A species repeated in several slots keeps the lowest slot only, which
+    matches vri_species.compute_vph.
+    """
+    encoded = encode_species(codes, lookup)
+    keep = encoded != UNMATCHED
+    for slot in range(1, SPECIES_SLOTS):
+        for lower in range(slot):
+            keep[:, slot] &= encoded[:, slot] != encoded[:, lower]
+    return encoded, keep
+
+
+def compute_vph_arrays(codes, vols, slots=None):
+    """Return the (n, 27) vph_fields matrix for (n, 6) codes and volumes.
+
+    A null volume in the winning slot gives NaN for that species; the
+    total vph counts nulls as 0.  slots, the result of
+    winning_slots(codes), may be given to reuse it across utilization
+    levels.
+    """
+    n = codes.shape[0]
+    encoded, keep = slots if slots is not None else winning_slots(codes)
+    rows = np.repeat(np.arange(n), SPECIES_SLOTS).reshape(n, SPECIES_SLOTS)
+    cells = rows[keep] * NUM_SPECIES + encoded[keep]
+    species = np.bincount(cells, weights=vols[keep], minlength=n * NUM_SPECIES)
+    vph = np.empty((n, NUM_SPECIES + 1))
+    vph[:, :NUM_SPECIES] = species.reshape(n, NUM_SPECIES)
+    totalvol = np.zeros(n)
+    for slot in range(SPECIES_SLOTS):
+        totalvol += np.nan_to_num(vols[:, slot])
+    vph[:, NUM_SPECIES] = totalvol
+    return vph
+
+
+def round_half_away(values):
+    """Round to whole numbers with halves away from zero, as Python 2 round()."""
+    return np.sign(values) * np.floor(np.abs(values) + 0.5)
+
+
+def compute_totals_arrays(vph, area, hectares=True):
+    """Return the (n, 16) total_vol_fields matrix for an (n, 27) vph matrix.
+
+    Nulls count as 0 and area is GEOMETRY_Area in square metres.  With
+    hectares False the Hectares column is left out.
+    """
+    species = np.nan_to_num(vph[:, :NUM_SPECIES])
+    grouped = species.dot(membership_matrix())
+    Ha = area / 10000.0
+    TOT = grouped[:, -1]
+    XZ = round_half_away(np.nan_to_num(vph[:, NUM_SPECIES]) - TOT)
+    totals = np.empty((vph.shape[0], len(SPECIES_GROUPS) + 3))
+    totals[:, :len(SPECIES_GROUPS)] = grouped[:, :-1] * Ha[:, np.newaxis]
+    totals[:, -3] = XZ * Ha
+    totals[:, -2] = Ha
+    totals[:, -1] = TOT * Ha
+    if not hectares:
+        return np.delete(totals, -2, axis=1)
+    return totals
+
+
+def compute_volume_arrays(codes, level_vols, area, write_vph=True, lookup=None):
+    """Return the vph and total volume matrix for (n, 6) codes and volumes.
+
+    level_vols holds the (n, 6) slot volumes of each utilization level.
+    Species codes are classified once for all levels, by lookup.
+    Columns are the vph_fields of each level followed by the
+    total_vol_fields of each level, Hectares with the first level only,
+    or only the totals when write_vph is False (see
+    vri_volumes.volume_fields).
+    """
+    slots = winning_slots(codes, lookup)
+    vph = [compute_vph_arrays(codes, vols, slots) for vols in level_vols]
+    totals = [compute_totals_arrays(level, area, i == 0) for i, level in enumerate(vph)]
+    if write_vph:
+        return np.hstack(vph + totals)
+    return np.hstack(totals)
@@ -0,0 +1,137 @@
+"""
+Copyright 2011-16 Province of British Columbia
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+# -------------------------------------------------------------------------
+# Source Name: vri_parallel.py
+# Version: ArcGIS 10.3.1, Python 2.7.8
+# Author:  British Columbia Ministry of Forests and Range
+#          Coast Forest Region Geomatic Services
+#
+# Description: Multi-process execution of a volume job.  The table is
+#              split into OBJECTID ranges, each range is read and
+#              computed in a process pool, and the results are funnelled
+#              back to the parent process, the single writer of the
+#              table.  Only a few ranges per worker are in flight at a
+#              time, so a slow writer does not let computed ranges pile
+#              up in memory.  Every row is computed by the same functions
+#              as a serial run, so the values written are identical.
+# ------------------------------------------------------------------------
+"""
+
+import collections
+import multiprocessing
+import os
+import sys
+import time
+
+from vri_backends import key_ranges, open_backend
+from vri_volumes import compute_read, read_range, write_range
+
+# ranges per worker when no chunk size is given, so a slow range does not
+# leave the other workers idle at the end of the run
+RANGES_PER_WORKER = 4
+
+# ranges submitted per worker and not yet written: enough to keep the
+# workers busy while the parent writes, few enough to bound memory
+IN_FLIGHT_PER_WORKER = 2
+
+
+def _compute_range(task):
+    """Read and compute one OBJECTID range in a worker process.
+
+    Returns the range, the compute_read result, the read and compute
+    time and the counts of species codes matching no rule.
+    """
+    table, spec, options, key_range = task
+    factory, args = spec
+    job = factory(*args)
+    backend = open_backend(table, read_only=True)
+    try:
+        start = time.time()
+        data = read_range(backend, job, options, key_range)
+        read_seconds = time.time() - start
+    finally:
+        backend.close()
+    start = time.time()
+    computed = compute_read(job, options, data)
+    unmatched = job.species.unmatched if job.species is not None else {}
+    return key_range, computed, read_seconds, time.time() - start, unmatched
+
+
+def _set_executable():
+    # inside ArcMap / ArcCatalog sys.executable is the application, not
+    # python, so worker processes must be started with python.exe
+    executable = os.path.basename(sys.executable).lower()
+    if sys.platform == 'win32' and not executable.startswith('python'):
+        multiprocessing.set_executable(os.path.join(sys.exec_prefix, 'python.exe'))
+
+
+def partition_size(bounds, workers, chunk_size=None):
+    """Return the OBJECTID range width used to partition the table."""
+    if chunk_size:
+        return chunk_size
+    span = bounds[1] - bounds[0] + 1
+    ranges = workers * RANGES_PER_WORKER
+    return max(1, (span + ranges - 1) // ranges)
+
+
+def run_parallel(backend, job, options, chunk_size=None, timer=None, sinks=(),
+                 checkpoint=None):
+    """Populate the job output fields using a pool of options.workers processes.
+
+    Workers open their own read connection to the table; the parent
+    process writes each range, to the table and sinks, in range order,
+    and records it in checkpoint if given.  At most
+    IN_FLIGHT_PER_WORKER ranges per worker are submitted and not yet
+    written; the next range is submitted as each one is written.
+    Returns the rows updated and skipped.
+    """
+    bounds = backend.key_bounds()
+    if bounds is None:
+        return 0, 0
+    size = partition_size(bounds, options.workers, chunk_size)
+    ranges = list(key_ranges(bounds, size))
+    if checkpoint is not None:
+        ranges = checkpoint.pending(ranges)
+    tasks = [(backend.table, job.spec, options, key_range) for key_range in ranges]
+    _set_executable()
+    pool = multiprocessing.Pool(options.workers)
+    try:
+        limit = IN_FLIGHT_PER_WORKER * options.workers
+        pending = collections.deque()
+        submitted = 0
+        for done in range(1, len(tasks) + 1):
+            while submitted < len(tasks) and len(pending) < limit:
+                pending.append(pool.apply_async(_compute_range, (tasks[submitted],)))
+                submitted += 1
+            result = pending.popleft().get()
+            key_range, computed, read_seconds, compute_seconds, unmatched = result
+            if job.species is not None:
+                job.species.add_unmatched(unmatched)
+            # worker time is summed over the workers, so can exceed the wall time
+            timer.add_time('worker_read', read_seconds)
+            timer.add_time('worker_compute', compute_seconds)
+            updated, skipped = write_range(backend, job, options, key_range, computed, timer,
+                                           sinks)
+            if checkpoint is not None:
+                checkpoint.mark_done(key_range)
+            timer.add_rows(updated, skipped, float(done) / len(tasks))
+        pool.close()
+    except Exception:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return timer.rows, timer.skipped
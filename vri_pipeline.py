@@ -0,0 +1,164 @@
+"""
+Copyright 2011-16 Province of British Columbia
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+# -------------------------------------------------------------------------
+# Source Name: vri_pipeline.py
+# Version: ArcGIS 10.3.1, Python 2.7.8
+# Author:  British Columbia Ministry of Forests and Range
+#          Coast Forest Region Geomatic Services
+#
+# Description: Pipelined execution of a volume job.  A reader thread
+#              prefetches OBJECTID range chunks into a bounded queue, a
+#              compute thread applies the species and group logic, and
+#              the calling thread writes the computed chunks, so table
+#              I/O and computation overlap.  Time each stage spends
+#              waiting on its queues is reported when the run ends and
+#              recorded as <stage>_stall time in the run report.
+#              Most useful when the table is on network storage.
+# ------------------------------------------------------------------------
+"""
+
+import threading
+import time
+
+try:
+    from queue import Empty, Full, Queue
+except ImportError:
+    from Queue import Empty, Full, Queue
+
+from vri_backends import add_message, key_ranges, open_backend
+from vri_volumes import compute_read, read_range, write_range
+
+STAGES = ('read', 'compute', 'write')
+
+# end of chunks marker passed down the queues
+_DONE = object()
+
+# seconds a blocked stage waits before checking whether the run stopped
+POLL_SECONDS = 0.1
+
+
+def _put(queue, item, timer, stage, stop):
+    # gives up, dropping item, once another stage has failed
+    start = time.time()
+    while not stop.is_set():
+        try:
+            queue.put(item, timeout=POLL_SECONDS)
+            break
+        except Full:
+            pass
+    timer.add_time(stage + '_stall', time.time() - start)
+
+
+def _get(queue, timer, stage, stop):
+    # returns _DONE once another stage has failed
+    start = time.time()
+    item = _DONE
+    while not stop.is_set():
+        try:
+            item = queue.get(timeout=POLL_SECONDS)
+            break
+        except Empty:
+            pass
+    timer.add_time(stage + '_stall', time.time() - start)
+    return item
+
+
+def run_pipeline(backend, job, options, chunk_size=100000, timer=None, sinks=(),
+                 checkpoint=None):
+    """Populate the job output fields with overlapped read, compute and write.
+
+    options.pipeline holds the read and write queue depths that bound the
+    chunks queued between the stages.  The reader opens its own
+    connection to the table; the calling thread's backend is the only
+    writer, of the table and of sinks (see vri_volumes.write_range), and
+    records each range written in checkpoint if given.  An error in any
+    stage stops the other stages and is raised once they have ended.
+    Returns the rows updated and skipped.
+    """
+    read_depth, write_depth = options.pipeline
+    ranges = list(key_ranges(backend.key_bounds(), chunk_size))
+    if checkpoint is not None:
+        ranges = checkpoint.pending(ranges)
+    read_queue = Queue(read_depth)
+    write_queue = Queue(write_depth)
+    errors = []
+    stop = threading.Event()
+
+    def fail(e):
+        errors.append(e)
+        stop.set()
+
+    def reader():
+        try:
+            reader_backend = open_backend(backend.table, read_only=True)
+            try:
+                for key_range in ranges:
+                    with timer.timed('read'):
+                        data = read_range(reader_backend, job, options, key_range)
+                    _put(read_queue, (key_range, data), timer, 'read', stop)
+                    if stop.is_set():
+                        break
+            finally:
+                reader_backend.close()
+        except Exception as e:
+            fail(e)
+        finally:
+            _put(read_queue, _DONE, timer, 'read', stop)
+
+    def computer():
+        try:
+            while True:
+                item = _get(read_queue, timer, 'compute', stop)
+                if item is _DONE:
+                    break
+                key_range, data = item
+                with timer.timed('compute'):
+                    result = compute_read(job, options, data)
+                _put(write_queue, (key_range, result), timer, 'compute', stop)
+        except Exception as e:
+            fail(e)
+        finally:
+            _put(write_queue, _DONE, timer, 'compute', stop)
+
+    threads = [threading.Thread(target=reader), threading.Thread(target=computer)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    done = 0
+    try:
+        while True:
+            item = _get(write_queue, timer, 'write', stop)
+            if item is _DONE:
+                break
+            key_range, computed = item
+            updated, skipped = write_range(backend, job, options, key_range, computed, timer,
+                                           sinks)
+            if checkpoint is not None:
+                checkpoint.mark_done(key_range)
+            done += 1
+            timer.add_rows(updated, skipped, float(done) / len(ranges))
+    except Exception as e:
+        fail(e)
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+    add_message('    pipeline stall time (s): ' +
+                ', '.join('%s %.2f' % (stage, timer.parts.get(stage + '_stall', 0.0))
+                          for stage in STAGES))
+    return timer.rows, timer.skipped
@@ -0,0 +1,122 @@
+"""
+Copyright 2011-16 Province of British Columbia
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+# -------------------------------------------------------------------------
+# Source Name: vri_qa.py
+# Version: ArcGIS 10.3.1, Python 2.7.8
+# Author:  British Columbia Ministry of Forests and Range
+#          Coast Forest Region Geomatic Services
+#
+# Description: Data quality checks evaluated on each chunk as the volumes
+#              are computed, replacing separate QA queries over the table.
+#              Each check counts the offending polygons and keeps a
+#              sample of the lowest OBJECTIDs:
+#                unknown_negative    - Unknown volume below 0
+#                unknown_large       - Unknown volume over half of M3
+#                slot_sum_mismatch   - the six slot volumes do not sum to
+#                                      the vph total read from the table
+#                null_species_volume - a slot with a volume (not null or
+#                                      0) but a null or blank species code
+#                zero_area           - polygon area 0 or null
+#              A check runs only when the tool reads or writes its
+#              fields; slot and Unknown checks cover every utilization
+#              level computed.
+# ------------------------------------------------------------------------
+"""
+
+import numpy as np
+
+from vri_species import (AREA_FIELD, M3_TEMPLATE, SPECIES_CD_FIELDS, TOTAL_VPH_TEMPLATE,
+                         UNKNOWN_FIELD, live_vol_fields, total_vol_fields)
+
+# OBJECTIDs kept for each check
+SAMPLE_SIZE = 20
+
+# Unknown is large when over this share of the total volume
+UNKNOWN_SHARE_LIMIT = 0.5
+
+# difference (m3/ha) allowed between the slot volume sum and the vph total
+SLOT_SUM_TOLERANCE = 0.01
+
+
+class QualityChecks(object):
+    """Counts and sample OBJECTIDs of polygons failing each data quality check.
+
+    read_fields and write_fields are those of the volume job; levels are
+    the utilization levels it computes.
+    """
+
+    name = 'qa'
+
+    def __init__(self, read_fields, write_fields, levels, sample_size=SAMPLE_SIZE):
+        self.levels = list(levels)
+        self.sample_size = sample_size
+        self.checks = ['null_species_volume']
+        self.fields = SPECIES_CD_FIELDS + [field for level in self.levels
+                                           for field in live_vol_fields(level)]
+        if all(_unknown_field(level) in write_fields for level in self.levels):
+            self.checks[:0] = ['unknown_negative', 'unknown_large']
+        if all(TOTAL_VPH_TEMPLATE.format(level=level) in read_fields for level in self.levels):
+            self.checks.append('slot_sum_mismatch')
+            self.fields += [TOTAL_VPH_TEMPLATE.format(level=level) for level in self.levels]
+        if AREA_FIELD in read_fields:
+            self.checks.append('zero_area')
+            self.fields.append(AREA_FIELD)
+        self.counts = dict((check, 0) for check in self.checks)
+        self.samples = dict((check, []) for check in self.checks)
+
+    def add(self, keys, rows, fields, extras):
+        """Check computed rows; extras holds the values of self.fields."""
+        values = np.array(rows, dtype=float).reshape(len(rows), len(fields))
+
+        def column(field):
+            if field in fields:
+                return values[:, fields.index(field)]
+            return np.array(extras[field], dtype=float)
+
+        failed = dict((check, np.zeros(len(keys), dtype=bool)) for check in self.checks)
+        blank = np.column_stack([[code is None or not code.strip() for code in extras[field]]
+                                 for field in SPECIES_CD_FIELDS])
+        for level in self.levels:
+            vols = np.column_stack([column(field) for field in live_vol_fields(level)])
+            failed['null_species_volume'] |= (blank & (np.nan_to_num(vols) != 0)).any(axis=1)
+            if 'unknown_negative' in failed:
+                unknown = column(_unknown_field(level))
+                m3 = column(M3_TEMPLATE.format(level=level))
+                failed['unknown_negative'] |= unknown < 0
+                failed['unknown_large'] |= (m3 > 0) & (unknown > UNKNOWN_SHARE_LIMIT * m3)
+            if 'slot_sum_mismatch' in failed:
+                vph = np.nan_to_num(column(TOTAL_VPH_TEMPLATE.format(level=level)))
+                slot_sum = np.nan_to_num(vols).sum(axis=1)
+                failed['slot_sum_mismatch'] |= np.abs(slot_sum - vph) > SLOT_SUM_TOLERANCE
+        if 'zero_area' in failed:
+            failed['zero_area'] = ~(column(AREA_FIELD) > 0)
+        keys = np.asarray(keys)
+        for check, mask in failed.items():
+            self.counts[check] += int(mask.sum())
+            # keep the lowest OBJECTIDs, whatever order the chunks arrive in
+            sample = self.samples[check] + np.sort(keys[mask])[:self.sample_size].tolist()
+            self.samples[check] = sorted(sample)[:self.sample_size]
+
+    def results(self):
+        """Return the count and sample OBJECTIDs of each check."""
+        return dict((check, {'polygons': self.counts[check], 'sample': self.samples[check]})
+                    for check in self.checks)
+
+
+def _unknown_field(level):
+    # the Unknown field of a level's group totals (Unknown or Unknown_125)
+    return [field for field in total_vol_fields(level, hectares=False)
+            if field.startswith(UNKNOWN_FIELD)][0]
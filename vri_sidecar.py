@@ -0,0 +1,109 @@
+"""
+Copyright 2011-16 Province of British Columbia
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+# -------------------------------------------------------------------------
+# Source Name: vri_sidecar.py
+# Version: ArcGIS 10.3.1, Python 2.7.8
+# Author:  British Columbia Ministry of Forests and Range
+#          Coast Forest Region Geomatic Services
+#
+# Description: Sidecar columnar output of the volume fields.  Instead of
+#              adding 43 fields to an already wide VRI table, which
+#              rewrites every row and its geometry, the computed volumes
+#              are written to a directory holding one NumPy .npy file per
+#              field, plus the key (OBJECTID or a numeric key field such
+#              as FEATURE_ID) sorted ascending, and a sidecar.json
+#              manifest.  The source table is only read.  The .npy files
+#              can be memory-mapped (load_sidecar) and joined by key.
+# ------------------------------------------------------------------------
+"""
+
+import json
+import os
+
+import numpy as np
+
+MANIFEST = 'sidecar.json'
+OID_KEY = 'OBJECTID'
+
+
+class SidecarWriter(object):
+    """Volume fields streamed to a directory of .npy column files.
+
+    Chunks are appended to raw .part files as they arrive, in any key
+    order; close() sorts them by key into the final .npy files.
+    """
+
+    name = 'sidecar'
+
+    def __init__(self, directory, fields, key_field=None, source=None):
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.directory = directory
+        self.fields = list(fields)
+        self.key_field = key_field
+        self.source = source
+        self.rows = 0
+        self._parts = dict((name, open(self._path(name) + '.part', 'wb'))
+                           for name in [self.key_name()] + self.fields)
+
+    def key_name(self):
+        return self.key_field or OID_KEY
+
+    def _path(self, name):
+        return os.path.join(self.directory, name + '.npy')
+
+    def add(self, keys, rows, fields, extras):
+        """Append computed rows; extras holds the key field values if read."""
+        if self.key_field:
+            keys = extras[self.key_field]
+            if None in keys:
+                raise ValueError('sidecar key field %s has null values' % self.key_field)
+        np.asarray(keys, dtype=np.int64).tofile(self._parts[self.key_name()])
+        values = np.array(rows, dtype=float).reshape(len(rows), len(fields))
+        for field in self.fields:
+            np.ascontiguousarray(values[:, fields.index(field)]).tofile(self._parts[field])
+        self.rows += len(rows)
+
+    def close(self):
+        """Write the key-sorted .npy files and the manifest."""
+        for part in self._parts.values():
+            part.close()
+        key_name = self.key_name()
+        keys = np.fromfile(self._path(key_name) + '.part', dtype=np.int64)
+        order = np.argsort(keys, kind='mergesort')
+        for name, dtype in [(key_name, np.int64)] + [(field, float) for field in self.fields]:
+            part = self._path(name) + '.part'
+            np.save(self._path(name), np.fromfile(part, dtype=dtype)[order])
+            os.remove(part)
+        manifest = {'key': key_name, 'fields': self.fields, 'rows': self.rows,
+                    'source': self.source}
+        with open(os.path.join(self.directory, MANIFEST), 'w') as f:
+            json.dump(manifest, f, indent=2)
+            f.write('\n')
+
+
+def load_sidecar(directory, mmap_mode='r'):
+    """Return the sorted key array and a dict of field arrays of a sidecar.
+
+    Arrays are memory-mapped unless mmap_mode is None; null volumes are
+    NaN.  Look rows up by key with numpy.searchsorted.
+    """
+    with open(os.path.join(directory, MANIFEST)) as f:
+        manifest = json.load(f)
+
+    def load(name):
+        return np.load(os.path.join(directory, name + '.npy'), mmap_mode=mmap_mode)
+    return load(manifest['key']), dict((field, load(field)) for field in manifest['fields'])
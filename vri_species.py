@@ -0,0 +1,287 @@
+"""
+Copyright 2011-16 Province of British Columbia
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+# -------------------------------------------------------------------------
+# Source Name: vri_species.py
+# Version: ArcGIS 10.3.1, Python 2.7.8
+# Author:  British Columbia Ministry of Forests and Range
+#          Coast Forest Region Geomatic Services
+#
+# Description: Species rule table and single-pass classifier shared by
+#              the VRI volume tools.  Each rule routes a SPECIES_CD_n
+#              code to its volume per hectare field using the same
+#              exact ('B') or prefix ('AC%') match that the original
+#              per-species selection queries used.
+# ------------------------------------------------------------------------
+"""
+
+import csv
+import math
+
+# number of species code / volume slots in a VEG_COMP(2009) record
+SPECIES_SLOTS = 6
+
+# utilization levels (minimum dbh in mm) having VEG_COMP live volume
+# fields; the tools default to the primary level, 17.5 cm
+UTILIZATION_LEVELS = ('125', '175', '225')
+PRIMARY_LEVEL = '175'
+
+# field name templates by utilization level
+LIVE_VOL_TEMPLATE = 'live_vol_per_ha_spp{slot}_{level}'
+VPH_TEMPLATE = '{species}_vph{level}'
+TOTAL_VPH_TEMPLATE = 'vph{level}'
+M3_TEMPLATE = 'M3_{level}'
+
+# species code fields
+SPECIES_CD_FIELDS = ['SPECIES_CD_' + str(i) for i in range(1, SPECIES_SLOTS + 1)]
+
+# species and species code match pattern, in output field order; the
+# first matching rule wins.  Other rules can be loaded with load_rules.
+SPECIES_RULES = [
+    ('ac', 'AC%'),  # cottonwood
+    ('at', 'AT%'),  # aspen
+    ('b', 'B'),  # balsam genus, species not identified
+    ('ba', 'BA'),  # balsam - amabilis fir
+    ('bg', 'BG'),  # balsam - grand fir
+    ('bl', 'BL'),  # balsam - subalpine fir
+    ('cw', 'C%'),  # cedar - western redcedar
+    ('dr', 'D%'),  # red alder
+    ('ep', 'E%'),  # birch - all native (paper, water, Alaska paper, Alaska x paper)
+    ('fd', 'F%'),  # Douglas-fir
+    ('h', 'H'),  # hemlock genus, species not identified
+    ('hm', 'HM'),  # hemlock - mountain hemlock
+    ('hw', 'HW'),  # hemlock - western hemlock
+    ('la', 'L%'),  # larch - all native species (alpine, tamarack, western)
+    ('mb', 'M%'),  # maple - all native species (big leaf or vine)
+    ('pa', 'PA'),  # pine - whitebark pine
+    ('pf', 'PF'),  # pine - limber pine
+    ('pl', 'PL'),  # pine - lodgepole pine
+    ('pli', 'PLI'),  # pine - interior lodgepole pine
+    ('pw', 'PW'),  # pine - western white pine
+    ('py', 'PY'),  # pine - ponderosa pine
+    ('s', 'S'),  # spruce genus
+    ('se', 'SE'),  # spruce - Engelmann spruce
+    ('ss', 'SS'),  # spruce - Sitka spruce
+    ('sw', 'SW'),  # spruce - white spruce
+    ('yc', 'Y%'),  # cypress - yellow-cedar
+]
+
+SPECIES = [species for species, pattern in SPECIES_RULES]
+
+
+def live_vol_fields(level=PRIMARY_LEVEL):
+    """Return the six slot live volume per hectare fields of a level."""
+    return [LIVE_VOL_TEMPLATE.format(slot=slot, level=level)
+            for slot in range(1, SPECIES_SLOTS + 1)]
+
+
+def vph_fields(level=PRIMARY_LEVEL):
+    """Return the species vph fields of a level followed by its total vph."""
+    return ([VPH_TEMPLATE.format(species=species, level=level) for species in SPECIES] +
+            [TOTAL_VPH_TEMPLATE.format(level=level)])
+
+
+LIVE_VOL_FIELDS = live_vol_fields()
+VPH_FIELDS = vph_fields()
+SPECIES_VPH_FIELDS = VPH_FIELDS[:-1]
+TOTAL_VPH_FIELD = VPH_FIELDS[-1]
+
+
+def match_rule(code, pattern):
+    """Return True if a species code matches an exact or 'XX%' prefix pattern."""
+    if code is None:
+        return False
+    if pattern.endswith('%'):
+        return code.startswith(pattern[:-1])
+    return code == pattern
+
+
+def load_rules(path):
+    """Return the (species, pattern) rules in a CSV file.
+
+    The file has species and pattern columns (other columns, such as a
+    description, are ignored), one rule per row in match order.  Several
+    rules may route codes to the same species; every species must be one
+    of SPECIES, as the species set defines the output fields.
+    """
+    rules = []
+    with open(path) as f:
+        for row in csv.DictReader(f):
+            species, pattern = row['species'].strip(), row['pattern'].strip()
+            if species not in SPECIES:
+                raise ValueError('%s: unknown species %r for pattern %r' % (path, species, pattern))
+            rules.append((species, pattern))
+    return rules
+
+
+class SpeciesLookup(object):
+    """Species code classification compiled from rules.
+
+    Each distinct code is matched against the rules once and the result
+    memoized, so a slot costs one dict lookup.  Occurrences of non-blank
+    codes matching no rule, which end up in Unknown, are counted in
+    unmatched.
+    """
+
+    def __init__(self, rules=SPECIES_RULES):
+        self.rules = [(SPECIES.index(species), pattern) for species, pattern in rules]
+        self.cache = {}
+        self.unmatched = {}
+
+    def _match(self, code):
+        for index, pattern in self.rules:
+            if match_rule(code, pattern):
+                return index
+        return None
+
+    def classify(self, code, count=1):
+        """Return the SPECIES index for a code, or None; count is its occurrences."""
+        try:
+            index = self.cache[code]
+        except KeyError:
+            index = self.cache[code] = self._match(code)
+        if index is None and code:
+            self.unmatched[code] = self.unmatched.get(code, 0) + count
+        return index
+
+    def add_unmatched(self, unmatched):
+        """Add the unmatched code counts of another lookup (a worker's)."""
+        for code, count in unmatched.items():
+            self.unmatched[code] = self.unmatched.get(code, 0) + count
+
+
+_default_lookup = SpeciesLookup()
+
+
+def classify(code):
+    """Return the index in SPECIES for a species code under the default rules, or None."""
+    return _default_lookup.classify(code)
+
+
+def classify_slots(codes, lookup=None):
+    """Return the SPECIES index (or None) of each slot's species code."""
+    classify_code = (lookup or _default_lookup).classify
+    return [classify_code(code) for code in codes]
+
+
+def compute_vph(codes, vols, slots=None):
+    """Route the six slot volumes of one record to the vph_fields values.
+
+    Species fields default to 0.  When a species appears in more than one
+    slot the lowest numbered slot wins, as the original tool selected and
+    calculated slots 6 through 1 in turn.  The total vph is the sum of
+    the six slot volumes with nulls counted as 0.  slots, the result of
+    classify_slots(codes), may be given to reuse it across utilization
+    levels.
+    """
+    if slots is None:
+        slots = classify_slots(codes)
+    values = [0] * (len(SPECIES) + 1)
+    for slot in range(SPECIES_SLOTS - 1, -1, -1):
+        index = slots[slot]
+        if index is not None:
+            values[index] = vols[slot]
+    totalvol = 0
+    for vol in vols:
+        if vol is None:
+            vol = 0
+        totalvol += vol
+    values[-1] = totalvol
+    return values
+
+
+# species group total volume fields and the species in each group
+SPECIES_GROUPS = [
+    ('Alder', ['dr']),
+    ('Aspen', ['at']),
+    ('Balsam', ['b', 'ba', 'bg', 'bl']),
+    ('Birch', ['ep']),
+    ('Cedar', ['cw']),
+    ('CtWood', ['ac']),
+    ('Cypress', ['yc']),
+    ('Fir', ['fd']),
+    ('Hemlock', ['h', 'hm', 'hw']),
+    ('Larch', ['la']),
+    ('Maple', ['mb']),
+    ('Pine', ['pa', 'pf', 'pl', 'pli', 'pw', 'py']),
+    ('Spruce', ['s', 'se', 'ss', 'sw']),
+]
+
+GROUP_FIELDS = [group for group, members in SPECIES_GROUPS]
+UNKNOWN_FIELD = 'Unknown'
+HECTARES_FIELD = 'Hectares'
+AREA_FIELD = 'GEOMETRY_Area'
+
+
+def total_vol_fields(level=PRIMARY_LEVEL, hectares=True):
+    """Return the species group total volume fields of a level.
+
+    The primary level keeps the original names (Alder ... Spruce,
+    Unknown); other levels add a _<level> suffix (Alder_125).  The
+    volume total is M3_<level> at every level.  Hectares does not depend
+    on the level, so can be left out of all but one level.
+    """
+    suffix = '' if level == PRIMARY_LEVEL else '_' + level
+    fields = [field + suffix for field in GROUP_FIELDS + [UNKNOWN_FIELD]]
+    if hectares:
+        fields.append(HECTARES_FIELD)
+    return fields + [M3_TEMPLATE.format(level=level)]
+
+
+TOTAL_VOL_FIELDS = total_vol_fields()
+
+# order the species volumes are added to make the total, kept from the
+# original tool so totals are reproduced to the last bit
+TOTAL_ORDER = ['dr', 'at', 'b', 'ba', 'bg', 'bl', 'ep', 'cw', 'yc', 'ac', 'fd', 'h', 'hm', 'hw',
+               'la', 'mb', 'pa', 'pf', 'pl', 'pli', 'pw', 'py', 's', 'se', 'ss', 'sw']
+
+
+def round_half_away(value):
+    """Round to a whole number with halves away from zero, as Python 2 round()."""
+    return math.copysign(math.floor(abs(value) + 0.5), value)
+
+
+def compute_totals(vph_values, area, hectares=True):
+    """Return the total_vol_fields values of one record.
+
+    vph_values are the vph_fields values of the record at one level
+    (nulls count as 0) and area is GEOMETRY_Area in square metres.
+    Unknown is the rounded difference between the total vph and the sum
+    of the named species.  hectares False leaves out Hectares.  A null
+    area (no GEOMETRY_Area or geometry) gives null values.
+    """
+    if area is None:
+        return [None] * (len(SPECIES_GROUPS) + (3 if hectares else 2))
+    vph = {}
+    for species, value in zip(SPECIES + [None], vph_values):
+        if value is None:
+            value = 0
+        vph[species] = value
+    Ha = area / 10000.0
+    TOT = 0
+    for field in TOTAL_ORDER:
+        TOT += vph[field]
+    values = []
+    for group, members in SPECIES_GROUPS:
+        groupvol = vph[members[0]]
+        for field in members[1:]:
+            groupvol += vph[field]
+        values.append(groupvol * Ha)
+    XZ = round_half_away(vph[None] - TOT)  # Unknown or other species
+    values.append(XZ * Ha)
+    if hectares:
+        values.append(Ha)
+    values.append(TOT * Ha)
+    return values
@@ -0,0 +1,152 @@
+"""
+Copyright 2011-16 Province of British Columbia
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+# -------------------------------------------------------------------------
+# Source Name: vri_summary.py
+# Version: ArcGIS 10.3.1, Python 2.7.8
+# Author:  British Columbia Ministry of Forests and Range
+#          Coast Forest Region Geomatic Services
+#
+# Description: Streaming group-by summary of the species group volumes.
+#              Alder ... Spruce, Unknown, Hectares and M3_175 are summed
+#              by user chosen key fields (TSA, BEC zone, management unit,
+#              ...) as they are computed, replacing a separate Summary
+#              Statistics pass.  Groups are kept in a dict and sums use
+#              Neumaier compensated summation.  The summary is written to
+#              a CSV file, a SQLite table ('path|table') or, with arcpy,
+#              a geodatabase table.
+# ------------------------------------------------------------------------
+"""
+
+import csv
+import os
+import sqlite3
+
+from vri_backends import SQLITE_EXTENSIONS, arcpy
+from vri_species import TOTAL_VOL_FIELDS
+
+COUNT_FIELD = 'polygons'
+
+
+class Summary(object):
+    """Compensated sums of value fields grouped by key field values."""
+
+    name = 'summary'
+
+    def __init__(self, key_fields, value_fields=TOTAL_VOL_FIELDS):
+        self.key_fields = list(key_fields)
+        self.value_fields = list(value_fields)
+        self.groups = {}
+
+    def add(self, keys, rows, fields, extras):
+        """Add output rows; extras holds the key field values of each row.
+
+        fields are the fields of the rows, which must include the
+        value_fields.  rows may be a float array.  Null and NaN values
+        are not summed.
+        """
+        if hasattr(rows, 'tolist'):
+            rows = rows.tolist()
+        positions = [fields.index(field) for field in self.value_fields]
+        size = len(positions)
+        groups = zip(*[extras[field] for field in self.key_fields])
+        for group, row in zip(groups, rows):
+            group = tuple(_key_value(value) for value in group)
+            sums = self.groups.get(group)
+            if sums is None:
+                # count, then a (sum, compensation) pair per value field
+                sums = self.groups[group] = [0] + [0.0] * (2 * size)
+            sums[0] += 1
+            for i, position in enumerate(positions):
+                value = row[position]
+                if value is None or value != value:
+                    continue
+                total = sums[2 * i + 1]
+                t = total + value
+                if abs(total) >= abs(value):
+                    sums[2 * i + 2] += (total - t) + value
+                else:
+                    sums[2 * i + 2] += (value - t) + total
+                sums[2 * i + 1] = t
+
+    def rows(self):
+        """Return the summary rows, sorted by key: keys, polygons, sums."""
+        result = []
+        for group in sorted(self.groups, key=lambda keys: [(k is not None, k) for k in keys]):
+            sums = self.groups[group]
+            result.append(list(group) + [sums[0]] +
+                          [sums[2 * i + 1] + sums[2 * i + 2]
+                           for i in range(len(self.value_fields))])
+        return result
+
+    def fields(self):
+        return self.key_fields + [COUNT_FIELD] + self.value_fields
+
+    def write(self, output):
+        """Write the summary to a CSV file, SQLite table or geodatabase table."""
+        if output.lower().endswith('.csv'):
+            _write_csv(output, self.fields(), self.rows())
+        elif output.split('|')[0].lower().endswith(SQLITE_EXTENSIONS):
+            _write_sqlite(output, self.fields(), self.rows())
+        else:
+            _write_arcpy(output, self.fields(), self.rows(), len(self.key_fields))
+
+
+def _key_value(value):
+    # numeric keys read as floats by the numpy engine group with the
+    # integers read by the row engine
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _write_csv(path, fields, rows):
+    with open(path, 'w') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(fields)
+        writer.writerows(rows)
+
+
+def _write_sqlite(output, fields, rows):
+    if '|' not in output:
+        raise ValueError('SQLite tables are given as path|table: ' + output)
+    path, name = output.split('|', 1)
+    connection = sqlite3.connect(path)
+    quoted = ['"%s"' % field for field in fields]
+    with connection:
+        connection.execute('DROP TABLE IF EXISTS "%s"' % name)
+        connection.execute('CREATE TABLE "%s" (%s)' % (name, ', '.join(quoted)))
+        connection.executemany('INSERT INTO "%s" VALUES (%s)' %
+                               (name, ', '.join('?' * len(fields))), rows)
+    connection.close()
+
+
+def _write_arcpy(table, fields, rows, key_count):
+    if arcpy is None:
+        raise RuntimeError('arcpy is required to write ' + table)
+    if arcpy.Exists(table):
+        arcpy.Delete_management(table)
+    arcpy.CreateTable_management(os.path.dirname(table), os.path.basename(table))
+    for i, field in enumerate(fields):
+        if i < key_count:
+            arcpy.AddField_management(table, field, "TEXT", "", "", 254)
+        elif field == COUNT_FIELD:
+            arcpy.AddField_management(table, field, "LONG")
+        else:
+            arcpy.AddField_management(table, field, "DOUBLE")
+    with arcpy.da.InsertCursor(table, fields) as ic:
+        for row in rows:
+            ic.insertRow([None if value is None else str(value) if i < key_count else value
+                          for i, value in enumerate(row)])
@@ -0,0 +1,728 @@
+"""
+Copyright 2011-16 Province of British Columbia
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+# -------------------------------------------------------------------------
+# Source Name: vri_volumes.py
+# Version: ArcGIS 10.3.1, Python 2.7.8
+# Author:  British Columbia Ministry of Forests and Range
+#          Coast Forest Region Geomatic Services
+#
+# Description: Shared steps of the VRI volume tools: planning the output
+#              fields, and populating them with either engine
+#                row   - per row cursor update (vri_species)
+#                numpy - vectorized column arrays (vri_numpy)
+#              over the whole table or streamed in OBJECTID range chunks,
+#              optionally recomputing only rows whose inputs changed,
+#              summarizing the group volumes by key fields in the same
+#              scan (vri_summary), writing the volumes to sidecar
+#              column files instead of the table (vri_sidecar) and
+#              resuming interrupted runs from a checkpoint
+#              (vri_checkpoint) and running data quality checks in the
+#              same scan (vri_qa).  Polygon area is read from GEOMETRY_Area
+#              or, when that field is missing or stale, derived from the
+#              geometry in the same scan (vri_geometry).
+# ------------------------------------------------------------------------
+"""
+
+import argparse
+
+from vri_backends import GEOMETRY_AREA, add_message, key_ranges, nan_to_none, open_backend
+from vri_incremental import (FINGERPRINT_LENGTH, changed_arrays, changed_rows,
+                             fingerprint_field, job_salt)
+from vri_instrument import RunReport, StageTimer, profiled
+from vri_species import (AREA_FIELD, PRIMARY_LEVEL, SPECIES_CD_FIELDS, SPECIES_RULES,
+                         SPECIES_SLOTS, UTILIZATION_LEVELS, VPH_FIELDS, SpeciesLookup,
+                         classify_slots, compute_totals, compute_vph, live_vol_fields,
+                         load_rules, total_vol_fields, vph_fields)
+
+ENGINES = ('row', 'numpy')
+
+# estimated peak bytes held per field value of a chunk row, by engine:
+# cursor tuples, output lists and sink copies for the row engine; read
+# buffers, column and output arrays for numpy.  Measured on vri_benchmark
+# tables with --qa (row 37, numpy 26), plus a margin.
+CHUNK_VALUE_BYTES = {'row': 44, 'numpy': 32}
+
+# estimated bytes of a polygon geometry blob read to derive the area
+GEOMETRY_BYTES = 4096
+
+# OBJECTID range width used when a mode needs to stream and no chunk size
+# is given
+DEFAULT_CHUNK_SIZE = 100000
+
+# unmatched species codes listed at the end of a run
+UNMATCHED_REPORT_LIMIT = 20
+
+
+def build_parser(description, summary=True, species=True):
+    """Return the command line parser shared by the volume tools.
+
+    summary adds the group volume summary and polygon area options, for
+    tools that write the group total fields; species adds the species
+    rules option, for tools that classify species codes.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('input', help='VRI table having VEG_COMP(2009) field names')
+    parser.add_argument('--levels', nargs='+', choices=UTILIZATION_LEVELS,
+                        default=[PRIMARY_LEVEL],
+                        help='utilization levels (dbh in mm) to compute in one pass '
+                             '(default: %s)' % PRIMARY_LEVEL)
+    if species:
+        parser.add_argument('--species-rules', metavar='FILE',
+                            help='species rules CSV file (species,pattern) to use instead of '
+                                 'the built in rules')
+    parser.add_argument('--engine', choices=ENGINES, default='row',
+                        help='volume engine (default: row)')
+    parser.add_argument('--chunk-size', type=int,
+                        help='stream the table in OBJECTID ranges of this many ids')
+    parser.add_argument('--memory-mb', type=int,
+                        help='stream the table in chunks sized to this memory budget')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='compute OBJECTID ranges in this many processes (default: 1)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only recompute rows whose inputs changed since the last run')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='overlap reading, computing and writing in threads')
+    parser.add_argument('--read-queue-depth', type=int, default=2,
+                        help='chunks read ahead of the compute stage (default: 2)')
+    parser.add_argument('--write-queue-depth', type=int, default=2,
+                        help='computed chunks queued for the writer (default: 2)')
+    parser.add_argument('--checkpoint', metavar='FILE',
+                        help='record completed OBJECTID ranges in FILE and resume from it')
+    parser.add_argument('--qa', action='store_true',
+                        help='run data quality checks on the inputs and volumes in the same pass')
+    parser.add_argument('--qa-sample', type=int, default=20,
+                        help='OBJECTIDs reported for each failed check (default: 20)')
+    parser.add_argument('--progress-every', type=int,
+                        help='report progress with an ETA every this many rows')
+    parser.add_argument('--report', help='write a JSON run report to this file')
+    parser.add_argument('--profile', help='write cProfile stats of the compute stage to this file')
+    if summary:
+        parser.add_argument('--area-from-geometry', action='store_true',
+                            help='derive polygon area from the geometry instead of '
+                                 'GEOMETRY_Area (automatic when that field is missing)')
+        parser.add_argument('--summary-by', nargs='+', metavar='FIELD',
+                            help='sum the group volumes by these fields (e.g. TSA_NUMBER)')
+        parser.add_argument('--summary-output',
+                            help='summary CSV file, SQLite path|table or geodatabase table')
+        parser.add_argument('--summary-only', action='store_true',
+                            help='write the summary only, not the per polygon volumes')
+    parser.add_argument('--sidecar', metavar='DIR',
+                        help='write the volumes to .npy column files in DIR, not the table')
+    parser.add_argument('--sidecar-key', metavar='FIELD',
+                        help='numeric key field of the sidecar files (default: OBJECTID)')
+    return parser
+
+
+def plan_schema(backend, fields, text_fields=()):
+    """Add the output fields missing from the table in one batch.
+
+    fields are DOUBLE fields; text_fields are TEXT fields of
+    FINGERPRINT_LENGTH characters.  The table schema is read once.  No
+    defaults are calculated: every output field is written for every row
+    by the compute pass, species without volume being written as 0.
+    """
+    add_message('Adding volume tabulation fields to VRI table... ')
+    existing = set(field.lower() for field in backend.list_fields())
+    missing = []
+    missing_text = []
+    for idField in list(fields) + list(text_fields):
+        if idField.lower() in existing:
+            add_message('    ' + idField + ' exists - skipping')
+        elif idField in text_fields:
+            missing_text.append(idField)
+        else:
+            missing.append(idField)
+    if missing:
+        backend.add_fields(missing)
+    if missing_text:
+        backend.add_fields(missing_text, 'TEXT', FINGERPRINT_LENGTH)
+    for idField in missing + missing_text:
+        add_message('    ' + idField + ' added')
+    return missing + missing_text
+
+
+class VolumeJob(object):
+    """The input and output fields of a volume computation.
+
+    read_fields and write_fields are declared up front and are the only
+    job fields read (see read_plan) and written; no other attributes,
+    nor the geometry, are fetched.  compute_row maps the read_fields
+    values of one row to the write_fields values; compute_arrays maps a
+    dict of read_fields column arrays to an (n, len(write_fields))
+    array.  total_fields are the species group total fields among the
+    write_fields.  species is the vri_species.SpeciesLookup of jobs that
+    classify species codes.  spec is the job factory and its arguments,
+    so worker processes can rebuild the job.
+    """
+
+    def __init__(self, name, read_fields, write_fields, compute_row, compute_arrays, spec,
+                 total_fields=(), species=None):
+        self.name = name
+        self.spec = spec
+        self.read_fields = read_fields
+        self.write_fields = write_fields
+        self.total_fields = list(total_fields)
+        self.species = species
+        self.compute_row = compute_row
+        self.compute_arrays = compute_arrays
+
+
+def utilization_levels(levels=None):
+    """Return the utilization levels to compute, in ascending order."""
+    return tuple(sorted(set(levels or [PRIMARY_LEVEL])))
+
+
+def level_vph_fields(levels):
+    """Return the vph fields of each level in turn."""
+    return [field for level in levels for field in vph_fields(level)]
+
+
+def level_total_fields(levels):
+    """Return the group total fields of each level in turn, Hectares once."""
+    return [field for i, level in enumerate(levels)
+            for field in total_vol_fields(level, hectares=i == 0)]
+
+
+def level_live_vol_fields(levels):
+    """Return the slot live volume fields of each level in turn."""
+    return [field for level in levels for field in live_vol_fields(level)]
+
+
+def species_lookup(rules=None):
+    """Return the species code lookup of a rules CSV file, or the default rules."""
+    return SpeciesLookup(load_rules(rules) if rules else SPECIES_RULES)
+
+
+def vph_job(levels=None, rules=None):
+    """Populate the vph fields of each level from the species codes and slot volumes.
+
+    rules is a species rules CSV file (vri_species.load_rules), or None
+    for the default rules.
+    """
+    levels = utilization_levels(levels)
+    lookup = species_lookup(rules)
+
+    def compute_row(values):
+        codes = values[:SPECIES_SLOTS]
+        slots = classify_slots(codes, lookup)
+        result = []
+        for i in range(len(levels)):
+            start = SPECIES_SLOTS * (i + 1)
+            result.extend(compute_vph(codes, values[start:start + SPECIES_SLOTS], slots))
+        return result
+
+    def compute_arrays(columns):
+        import numpy as np
+        from vri_numpy import compute_vph_arrays, stack_columns, winning_slots
+        codes = stack_columns(columns, SPECIES_CD_FIELDS)
+        slots = winning_slots(codes, lookup)
+        return np.hstack([compute_vph_arrays(codes, stack_columns(columns, live_vol_fields(level)),
+                                             slots) for level in levels])
+    return VolumeJob('vph', SPECIES_CD_FIELDS + level_live_vol_fields(levels),
+                     level_vph_fields(levels), compute_row, compute_arrays,
+                     (vph_job, (levels, rules)), species=lookup)
+
+
+def totals_job(levels=None):
+    """Populate the group total fields of each level from its vph fields and polygon area."""
+    levels = utilization_levels(levels)
+    size = len(VPH_FIELDS)
+
+    def compute_row(values):
+        result = []
+        for i in range(len(levels)):
+            result.extend(compute_totals(values[size * i:size * (i + 1)], values[-1], i == 0))
+        return result
+
+    def compute_arrays(columns):
+        import numpy as np
+        from vri_numpy import compute_totals_arrays, stack_columns
+        return np.hstack([compute_totals_arrays(stack_columns(columns, vph_fields(level)),
+                                                columns[AREA_FIELD], i == 0)
+                          for i, level in enumerate(levels)])
+    return VolumeJob('totals', level_vph_fields(levels) + [AREA_FIELD],
+                     level_total_fields(levels), compute_row, compute_arrays,
+                     (totals_job, (levels,)), level_total_fields(levels))
+
+
+def volume_fields(write_vph=True, levels=None):
+    """Return the output fields of the combined volume tool."""
+    levels = utilization_levels(levels)
+    if write_vph:
+        return level_vph_fields(levels) + level_total_fields(levels)
+    return level_total_fields(levels)
+
+
+def volumes_job(write_vph=True, levels=None, rules=None):
+    """Populate the vph and total volume fields from one read of the table.
+
+    The species codes, slot volumes of each utilization level and
+    polygon area are read once and all output sets are written in the
+    same row update.  Species codes are classified once for all levels,
+    by the rules in the rules CSV file if given.  With write_vph False
+    only the group total fields are written.
+    """
+    levels = utilization_levels(levels)
+    lookup = species_lookup(rules)
+
+    def compute_row(values):
+        codes = values[:SPECIES_SLOTS]
+        slots = classify_slots(codes, lookup)
+        vph = []
+        totals = []
+        for i in range(len(levels)):
+            start = SPECIES_SLOTS * (i + 1)
+            level_vph = compute_vph(codes, values[start:start + SPECIES_SLOTS], slots)
+            vph.extend(level_vph)
+            totals.extend(compute_totals(level_vph, values[-1], i == 0))
+        if write_vph:
+            return vph + totals
+        return totals
+
+    def compute_arrays(columns):
+        from vri_numpy import compute_volume_arrays, stack_columns
+        return compute_volume_arrays(stack_columns(columns, SPECIES_CD_FIELDS),
+                                     [stack_columns(columns, live_vol_fields(level))
+                                      for level in levels],
+                                     columns[AREA_FIELD], write_vph, lookup)
+    return VolumeJob('volumes', SPECIES_CD_FIELDS + level_live_vol_fields(levels) + [AREA_FIELD],
+                     volume_fields(write_vph, levels), compute_row, compute_arrays,
+                     (volumes_job, (write_vph, levels, rules)), level_total_fields(levels),
+                     lookup)
+
+
+class RunOptions(object):
+    """How a volume job is run.
+
+    engine       - 'row' or 'numpy'
+    chunk_size   - stream the table in OBJECTID ranges of this many ids
+    workers      - compute ranges in this many processes (vri_parallel)
+    incremental  - only recompute rows whose inputs changed (vri_incremental)
+    pipeline     - (read, write) queue depths to overlap I/O and compute
+                   in threads (vri_pipeline), or None
+    summary_by   - key fields to summarize the group volumes by
+                   (vri_summary), or None
+    sidecar_key  - key field read for the sidecar files (vri_sidecar),
+                   or None for OBJECTID
+    write        - write the output fields to the table; False when the
+                   output only goes to a summary or sidecar
+    area_from_geometry - read polygon area from the geometry
+                   (GEOMETRY_AREA) instead of GEOMETRY_Area
+    qa_fields    - fields read for the data quality checks (vri_qa), or
+                   None
+    """
+
+    def __init__(self, engine='row', chunk_size=None, workers=1, incremental=False,
+                 pipeline=None, summary_by=None, sidecar_key=None, write=True,
+                 area_from_geometry=False, qa_fields=None):
+        self.engine = engine
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.incremental = incremental
+        self.pipeline = pipeline
+        self.summary_by = summary_by
+        self.sidecar_key = sidecar_key
+        self.write = write
+        self.area_from_geometry = area_from_geometry
+        self.qa_fields = qa_fields
+
+    @classmethod
+    def from_args(cls, args):
+        """Return the options given on the command line (see build_parser)."""
+        chunk_size = args.chunk_size
+        pipeline = None
+        if args.pipeline:
+            pipeline = (args.read_queue_depth, args.write_queue_depth)
+        summary_by = getattr(args, 'summary_by', None)
+        write = not (getattr(args, 'summary_only', False) or args.sidecar)
+        return cls(args.engine, chunk_size, args.workers, args.incremental, pipeline,
+                   summary_by, args.sidecar_key, write,
+                   getattr(args, 'area_from_geometry', False))
+
+    def extra_fields(self):
+        """Return the fields passed to the sinks (summary and sidecar keys, QA inputs)."""
+        fields = list(self.summary_by or [])
+        for field in [self.sidecar_key] + list(self.qa_fields or []):
+            if field and field not in fields:
+                fields.append(field)
+        return fields
+
+
+def memory_chunk_size(job, options, memory_mb):
+    """Return the chunk size whose rows should fit in memory_mb megabytes.
+
+    A row holds the values of its read_plan() and output fields, at the
+    CHUNK_VALUE_BYTES of the engine, and its geometry when the area is
+    derived from it.  The estimate covers one chunk; the interpreter and
+    modules take some 40 MB more.
+    """
+    values = len(read_plan(job, options)) + len(output_fields(job, options))
+    row_bytes = CHUNK_VALUE_BYTES[options.engine] * values
+    if options.area_from_geometry:
+        row_bytes += GEOMETRY_BYTES
+    return max(1, memory_mb * 1024 * 1024 // row_bytes)
+
+
+def output_fields(job, options):
+    """Return the fields written by a job, with its fingerprint if incremental."""
+    if options.incremental:
+        return job.write_fields + [fingerprint_field(job)]
+    return list(job.write_fields)
+
+
+def input_fields(job, options):
+    """Return the fields read for the job inputs, GEOMETRY_AREA for the area if derived."""
+    if options.area_from_geometry:
+        return [GEOMETRY_AREA if field == AREA_FIELD else field for field in job.read_fields]
+    return list(job.read_fields)
+
+
+def extra_read_fields(job, options):
+    """Return the options.extra_fields() that are not job inputs."""
+    return [field for field in options.extra_fields() if field not in job.read_fields]
+
+
+def read_plan(job, options):
+    """Return the fields read by a run, in read order.
+
+    The job inputs are followed by the extra_read_fields() and, in
+    incremental mode, the stored fingerprint.  GEOMETRY_AREA stands in
+    for AREA_FIELD when the area is derived from the geometry.
+    """
+    read_fields = input_fields(job, options) + extra_read_fields(job, options)
+    if options.incremental:
+        read_fields.append(fingerprint_field(job))
+    return read_fields
+
+
+def check_read_plan(backend, job, options):
+    """Raise ValueError if a field of the read plan is missing from the table.
+
+    Run before the schema is changed, so the incremental fingerprint
+    field, which the tool adds itself, is not checked.  Returns the read
+    plan and the number of fields in the table.
+    """
+    read_fields = read_plan(job, options)
+    fields = backend.list_fields()
+    names = set(field.lower() for field in fields)
+    added = fingerprint_field(job) if options.incremental else None
+    missing = [field for field in read_fields
+               if field not in (GEOMETRY_AREA, added) and field.lower() not in names]
+    if missing:
+        raise ValueError('%s has no field %s' % (backend.table, ', '.join(missing)))
+    if GEOMETRY_AREA in read_fields:
+        backend.geometry_field()
+    return read_fields, len(fields)
+
+
+def read_range(backend, job, options, key_range=None):
+    """Read the fields of read_plan() for one key range (all rows if None).
+
+    Returns (keys, columns) for the numpy engine or a list of (key,
+    values) rows for the row engine.  An area derived from the geometry
+    is returned as AREA_FIELD.
+    """
+    read_fields = read_plan(job, options)
+    if options.engine == 'numpy':
+        keys, columns = backend.read_arrays(read_fields, key_range)
+        if GEOMETRY_AREA in columns:
+            columns[AREA_FIELD] = columns.pop(GEOMETRY_AREA)
+        return keys, columns
+    return backend.read_rows(read_fields, key_range)
+
+
+def compute_read(job, options, data):
+    """Compute the output rows for data returned by read_range.
+
+    Returns the keys and output rows to write, the number of rows
+    skipped and a dict of the options.extra_fields() values of those
+    rows.  The numpy engine returns its output rows as a float array
+    (NaN for null) unless incremental.  In incremental mode rows whose input fingerprint has
+    not changed are skipped, and the new fingerprint is appended to each
+    output row (see vri_incremental).
+    """
+    extras = {}
+    if options.engine == 'numpy':
+        keys, columns = data
+        total = len(keys)
+        if options.incremental:
+            keys, columns, fingerprints = changed_arrays(job, keys, columns)
+        for field in options.extra_fields():
+            extras[field] = nan_to_none(columns[field])
+        # rows stay a float array, converted by the backend as it writes
+        rows = job.compute_arrays(columns) if len(keys) else []
+        if options.incremental and len(keys):
+            rows = nan_to_none(rows)
+        keys = keys.tolist()
+    else:
+        total = len(data)
+        if options.incremental:
+            keys, values, fingerprints = changed_rows(job, data)
+        else:
+            keys = [key for key, row in data]
+            values = [row for key, row in data]
+        size = len(job.read_fields)
+        names = list(job.read_fields) + extra_read_fields(job, options)
+        for field in options.extra_fields():
+            position = names.index(field)
+            extras[field] = [row[position] for row in values]
+        if len(names) > size:
+            values = [row[:size] for row in values]
+        rows = [job.compute_row(row) for row in values]
+    if options.incremental:
+        rows = [list(row) + [new] for row, new in zip(rows, fingerprints)]
+    return keys, rows, total - len(keys), extras
+
+
+def write_range(backend, job, options, key_range, computed, timer, sinks=()):
+    """Write rows returned by compute_read to the table and to sinks.
+
+    sinks are outputs besides the table, a vri_summary.Summary or
+    vri_sidecar.SidecarWriter, given each chunk by add(keys, rows,
+    fields, extras).  Returns the rows updated, or computed when
+    options.write is False, and the rows skipped.
+    """
+    keys, rows, skipped, extras = computed
+    for sink in sinks:
+        if keys:
+            with timer.timed(sink.name):
+                sink.add(keys, rows, job.write_fields, extras)
+    if not keys or not options.write:
+        return len(keys), skipped
+    with timer.timed('write'):
+        updated = backend.write_rows(keys, output_fields(job, options), rows, key_range)
+    return updated, skipped
+
+
+def _cursor_progress(timer, total):
+    """Return a callback reporting an update cursor's progress through total rows."""
+    def progress(done):
+        timer.report_progress(done, float(done) / total if total else None)
+    return progress
+
+
+def run_chunk(backend, job, options, key_range=None, timer=None, sinks=()):
+    """Compute and write one key range; return rows updated and skipped."""
+    if options.engine == 'row' and not (options.incremental or options.area_from_geometry or
+                                        sinks):
+        # reads and writes are interleaved row by row in the update cursor
+        progress = None
+        if timer.progress_every and key_range is None:
+            progress = _cursor_progress(timer, backend.count_rows())
+        with timer.timed('update'):
+            updated = backend.update(job.read_fields, job.write_fields, job.compute_row,
+                                     key_range, progress)
+        return updated, 0
+    with timer.timed('read'):
+        data = read_range(backend, job, options, key_range)
+    with timer.timed('compute'):
+        computed = compute_read(job, options, data)
+    return write_range(backend, job, options, key_range, computed, timer, sinks)
+
+
+def run_job(backend, job, options=None, timer=None, sinks=(), checkpoint=None):
+    """Populate the job output fields; return the rows updated and skipped.
+
+    With a chunk_size the table is streamed in OBJECTID ranges of
+    chunk_size ids; each range is read, computed and written back before
+    the next is loaded, so memory use does not grow with the table.
+    Incremental and pipelined runs, and serial row engine runs that
+    cannot use the update cursor (area from the geometry, or sinks),
+    stream in DEFAULT_CHUNK_SIZE ranges unless a chunk_size is given.
+    timer, a vri_instrument.StageTimer, records time by part and row
+    counts, and reports progress every timer.progress_every rows as
+    ranges complete or, for the row engine's single update cursor, as
+    rows are updated.  Computed rows are also given to each of sinks
+    (see write_range).  With a checkpoint, a
+    vri_checkpoint.Checkpoint, ranges it records as done are skipped and
+    each range is recorded once written (DEFAULT_CHUNK_SIZE ranges
+    unless a chunk_size is given).
+    """
+    options = options or RunOptions()
+    timer = timer or StageTimer(job.name)
+    chunk_size = options.chunk_size
+    if not chunk_size and (options.incremental or options.pipeline or checkpoint):
+        chunk_size = DEFAULT_CHUNK_SIZE
+    if options.pipeline:
+        from vri_pipeline import run_pipeline
+        return run_pipeline(backend, job, options, chunk_size, timer, sinks, checkpoint)
+    if options.workers > 1:
+        from vri_parallel import run_parallel
+        return run_parallel(backend, job, options, chunk_size, timer, sinks, checkpoint)
+    if not chunk_size and options.engine == 'row' and (options.area_from_geometry or sinks):
+        # read_range would load the whole table as rows at once
+        chunk_size = DEFAULT_CHUNK_SIZE
+    if not chunk_size:
+        updated, skipped = run_chunk(backend, job, options, None, timer, sinks)
+        timer.add_rows(updated, skipped, 1.0)
+        return updated, skipped
+    ranges = list(key_ranges(backend.key_bounds(), chunk_size))
+    if checkpoint is not None:
+        ranges = checkpoint.pending(ranges)
+    for done, key_range in enumerate(ranges, 1):
+        updated, skipped = run_chunk(backend, job, options, key_range, timer, sinks)
+        if checkpoint is not None:
+            checkpoint.mark_done(key_range)
+        timer.add_rows(updated, skipped, float(done) / len(ranges))
+    return timer.rows, timer.skipped
+
+
+def report_unmatched(unmatched, limit=UNMATCHED_REPORT_LIMIT):
+    """Report the species codes that matched no rule, most frequent first."""
+    codes = sorted(unmatched, key=lambda code: (-unmatched[code], code))
+    listed = ', '.join('%s %d' % (code, unmatched[code]) for code in codes[:limit])
+    if len(codes) > limit:
+        listed += ', ... (%d more codes)' % (len(codes) - limit)
+    add_message('    %d species codes matched no rule, volume counted as Unknown: %s' %
+                (sum(unmatched.values()), listed))
+
+
+def report_qa(results):
+    """Report the polygons failing each data quality check."""
+    for check in sorted(results):
+        count, sample = results[check]['polygons'], results[check]['sample']
+        line = '    QA %s: %d polygons' % (check, count)
+        if sample:
+            line += ', OBJECTID ' + ', '.join(str(key) for key in sample) + \
+                (', ...' if count > len(sample) else '')
+        add_message(line)
+
+
+def run_tool(tool, args, job):
+    """Run a volume tool on the table given on the command line.
+
+    Adds the job output fields, populates them and reports progress and
+    timings; with --report a JSON run report is written and with
+    --profile the compute stage is run under cProfile.  With --summary-by
+    the group volumes are summarized in the same pass and written to
+    --summary-output; --summary-only leaves the table unchanged.  With
+    --sidecar the volumes are written to column files and the table is
+    opened read-only.  With --checkpoint an interrupted run resumes after
+    the OBJECTID ranges already written.  Only the fields of the read
+    plan are read, and they are checked to exist first.  With --qa the
+    data quality checks of vri_qa run on every chunk.  Polygon area is
+    derived from the geometry with --area-from-geometry or when the
+    table has no GEOMETRY_Area field.
+    """
+    inputVRI = args.input
+    add_message('The input data set is: ' + inputVRI)
+    options = RunOptions.from_args(args)
+    if options.pipeline and options.workers > 1:
+        raise ValueError('--pipeline and --workers are separate ways to run a job, so cannot '
+                         'be used together')
+    sinks = []
+    summary = sidecar = None
+    if options.summary_by:
+        if options.incremental:
+            raise ValueError('--summary-by needs every row, so cannot be used with --incremental')
+        if not args.summary_output:
+            raise ValueError('--summary-by needs a --summary-output')
+        from vri_summary import Summary
+        summary = Summary(options.summary_by, job.total_fields)
+        sinks.append(summary)
+    elif getattr(args, 'summary_only', False):
+        raise ValueError('--summary-only needs --summary-by fields')
+    if args.sidecar:
+        if options.incremental:
+            raise ValueError('--sidecar writes every row, so cannot be used with --incremental')
+        from vri_sidecar import SidecarWriter
+        sidecar = SidecarWriter(args.sidecar, job.write_fields, options.sidecar_key, inputVRI)
+        sinks.append(sidecar)
+    qa = None
+    if args.qa:
+        if options.incremental:
+            raise ValueError('--qa checks every row, so cannot be used with --incremental')
+        from vri_qa import QualityChecks
+        qa = QualityChecks(job.read_fields, job.write_fields, utilization_levels(args.levels),
+                           args.qa_sample)
+        options.qa_fields = qa.fields
+        sinks.append(qa)
+    checkpoint = None
+    if args.checkpoint:
+        if sinks:
+            raise ValueError('--checkpoint only resumes table updates, so cannot be used with '
+                             '--summary-by, --sidecar or --qa')
+        from vri_checkpoint import Checkpoint
+        checkpoint = Checkpoint(args.checkpoint, {'tool': tool, 'input': inputVRI,
+                                                  'fields': output_fields(job, options),
+                                                  'salt': job_salt(job)})
+        if checkpoint.done:
+            add_message('Resuming from checkpoint ' + args.checkpoint + ': OBJECTID ranges ' +
+                        ', '.join('%d-%d' % (start, stop - 1) for start, stop in checkpoint.done) +
+                        ' already done')
+    report = RunReport(tool, inputVRI, vars(args), args.progress_every)
+    backend = open_backend(inputVRI, read_only=not options.write)
+    try:
+        if AREA_FIELD in job.read_fields and not options.area_from_geometry and \
+                not backend.has_field(AREA_FIELD):
+            add_message('    ' + AREA_FIELD + ' not found, deriving polygon area from the geometry')
+            options.area_from_geometry = True
+        # Check the inputs exist before the table is changed
+        read_fields, table_fields = check_read_plan(backend, job, options)
+        add_message('    reading %d of %d fields%s' % (
+            len(read_fields), table_fields,
+            ', area from the geometry' if options.area_from_geometry else ''))
+        report.results['fields_read'] = read_fields
+        if not options.chunk_size and args.memory_mb:
+            options.chunk_size = memory_chunk_size(job, options, args.memory_mb)
+            add_message('    chunks of %d OBJECTIDs for --memory-mb %d' %
+                        (options.chunk_size, args.memory_mb))
+
+        # Add fields to input table
+        if options.write:
+            with report.stage('schema'):
+                plan_schema(backend, job.write_fields,
+                            [fingerprint_field(job)] if options.incremental else [])
+
+        # Populate new fields
+        if options.write:
+            add_message('Populating volume tabulation fields in VRI table... ')
+        else:
+            add_message('Computing volumes from VRI table... ')
+        with report.stage(job.name) as timer:
+            count, skipped = profiled(args.profile, run_job, backend, job, options, timer,
+                                      sinks, checkpoint)
+    finally:
+        backend.close()  # release table
+    if checkpoint is not None:
+        checkpoint.remove()
+    if options.write:
+        add_message('    ' + str(count) + ' rows updated!')
+    else:
+        add_message('    ' + str(count) + ' rows computed')
+    if options.incremental:
+        add_message('    ' + str(skipped) + ' unchanged rows skipped')
+    add_message('    %.1f s, %.0f rows/sec' % (timer.seconds, timer.as_dict()['rows_per_sec'] or 0))
+    if job.species is not None and job.species.unmatched:
+        report_unmatched(job.species.unmatched)
+        report.results['unmatched_species_codes'] = job.species.unmatched
+    if qa is not None:
+        report_qa(qa.results())
+        report.results['qa'] = qa.results()
+    if summary is not None:
+        with report.stage('summary'):
+            summary.write(args.summary_output)
+        add_message('    summary of ' + str(len(summary.groups)) + ' groups written to ' +
+                    args.summary_output)
+    if sidecar is not None:
+        with report.stage('sidecar'):
+            sidecar.close()
+        add_message('    ' + str(sidecar.rows) + ' rows of volumes written to ' + args.sidecar)
+    if args.report:
+        report.write(args.report)
+        add_message('    run report written to ' + args.report)
+    add_message('------------------------------------------------------------')
+    return count